@@ -10,5 +10,6 @@ them.
 
 from . import analysis
 from . import cipher
+from . import solvers
 from . import util
 from . import freq
@@ -4,20 +4,326 @@
 Utilities for studying and breaking classical ciphers.
 """
 
+import array
 import collections
+import decimal
+import functools
+import itertools
+import math
+import operator
 import string
+import sys
 
-def frequency_analysis(text, ngram=1):
+try:
+    from itertools import ifilter, imap, izip
+except ImportError:
+    ifilter, imap, izip = filter, map, zip
+
+try:
+    import _decimal # Only there when decimal is backed by libmpdec.
+    _LIBMPDEC = True
+except ImportError:
+    _LIBMPDEC = False
+
+
+# Unsigned array typecodes by item size, for packing n-grams into words.
+_WORDS = {}
+for _typecode in 'QLIHB':
+    try:
+        _WORDS[array.array(_typecode).itemsize] = _typecode
+    except ValueError:
+        pass # No 'Q' in Python 2.
+
+# How many n-grams to pack into words at a time.
+_CHUNK = 1 << 20
+
+# Single-byte strings for each alphabet index, for counting with bytes.count.
+_BYTES = [bytes(bytearray([i])) for i in range(256)]
+
+# Counting packed n-grams only pays off if Counter tallies them at C speed,
+# which it doesn't in Python 2, and for texts longer than this.
+_FAST_COUNTER = hasattr(collections, '_count_elements')
+_SHORT = 1 << 8
+
+# How many distinct characters a text can have and still be quicker to count
+# with str.count, one character at a time.
+_FEW = 64
+
+
+def encode(text, alphabet=string.ascii_lowercase, strip=False):
+    """
+    Translates a text into a compact array of integers, replacing each
+    character with its index in the alphabet. Characters that don't occur in
+    the alphabet are replaced with len(alphabet) or, if strip is True, left
+    out.
+    """
+    lookup = dict((c, i) for i, c in enumerate(alphabet))
+    if len(lookup) != len(alphabet):
+        raise ValueError('Alphabet has duplicates!')
+    size = len(alphabet)
+
+    if size < 256 and isinstance(text, type(u'')):
+        # Fast path: let unicode.translate do the lookups and reinterpret the
+        # result as bytes.
+        table = dict((ord(c), i) for c, i in lookup.items())
+        table.update((ord(c), size) for c in set(text).difference(lookup))
+        codes = array.array('B', text.translate(table).encode('latin-1'))
+    elif size < 256 and isinstance(text, bytes) and isinstance(text, str) and \
+         all(isinstance(c, str) and len(c) == 1 for c in alphabet):
+        # Python 2 byte strings can be translated with a 256-byte table.
+        table = bytearray([size]) * 256
+        for c, i in lookup.items():
+            table[ord(c)] = i
+        codes = array.array('B', text.translate(bytes(table)))
+    else:
+        codes = array.array('B' if size < 256 else 'L',
+                            imap(lookup.get, text, itertools.repeat(size)))
+    return _clean(codes, size) if strip else codes
+
+def _encoded(text, alphabet):
+    """
+    Encodes a text, unless it's already been encoded.
+    """
+    if isinstance(text, array.array):
+        return text
+    return encode(text, alphabet)
+
+def _tobytes(codes):
+    if hasattr(codes, 'tobytes'):
+        return codes.tobytes()
+    return codes.tostring()
+
+def _gram_indices(codes, ngram, size):
+    """
+    Yields the index of each n-gram in an encoded text, reading the n-gram as
+    a number in base size. N-grams containing characters outside the alphabet
+    are skipped.
+    """
+    return ifilter(functools.partial(operator.gt, size ** ngram),
+                   _all_gram_indices(codes, ngram, size))
+
+def _all_gram_indices(codes, ngram, size):
+    """
+    As _gram_indices, except n-grams containing characters outside the
+    alphabet aren't skipped, but get an index of size ** ngram or more. The
+    nth index yielded is always that of the n-gram at position n.
+    """
+    limit = size ** ngram
+    if ngram > 1:
+        # Make sure n-grams with an out-of-alphabet character in any position
+        # end up out of range.
+        remap = list(range(size)) + [limit]
+        codes = list(imap(remap.__getitem__, codes))
+
+    indices = iter(codes)
+    for k in range(1, ngram):
+        indices = imap(operator.add,
+                       imap(operator.mul, indices, itertools.repeat(size)),
+                       itertools.islice(codes, k, None))
+    return indices
+
+def _count_grams(codes, ngram, size):
+    """
+    Counts the n-grams in an encoded text. Returns a Counter keyed by n-gram
+    index (as _gram_indices). N-grams containing characters outside the
+    alphabet are left out.
+    """
+    columns, counts = _distinct_grams(codes, ngram, size)
+    indices = iter(columns[0])
+    for column in columns[1:]:
+        indices = imap(operator.add,
+                       imap(operator.mul, indices, itertools.repeat(size)),
+                       column)
+    return collections.Counter(dict(izip(indices, counts)))
+
+def _distinct_grams(codes, ngram, size):
+    """
+    Counts the n-grams in an encoded text, leaving out those containing
+    characters outside the alphabet. Returns a list of ngram columns, the
+    kth holding the kth character code of each distinct n-gram, and a list
+    of how often each of them occurs.
+    """
+    width = min([w for w in _WORDS if w >= ngram] or [None])
+    if width is None or size > 255:
+        # General case: count tuples.
+        raw = collections.Counter(izip(*[itertools.islice(codes, k, None)
+                                         for k in range(ngram)]))
+        columns = list(izip(*raw)) or [()] * ngram
+        clean = not columns[0] or max(imap(max, columns)) < size
+    else:
+        # Lay the text out so each n-gram fills a machine word of its own,
+        # and let Counter tally those words. This avoids creating a string
+        # (or a tuple) for every position.
+        raw = collections.Counter()
+        text = _tobytes(codes)
+        clean = not text.translate(None, bytes(bytearray(range(size))))
+        for start in range(0, len(text) - ngram + 1, _CHUNK):
+            chunk = text[start:start + _CHUNK + ngram - 1]
+            grams = len(chunk) - ngram + 1
+            buf = bytearray(width * grams)
+            for k in range(ngram):
+                buf[k::width] = chunk[k:k + grams]
+            raw.update(array.array(_WORDS[width], bytes(buf)))
+
+        # Each byte of a word holds one character code; pull out all the
+        # first characters, all the second ones and so on in one go rather
+        # than taking the words apart one by one.
+        words = bytearray(_tobytes(array.array(_WORDS[width], raw)))
+        if sys.byteorder == 'little':
+            columns = [words[k::width] for k in range(ngram)]
+        else:
+            columns = [words[width - k - 1::width] for k in range(ngram)]
+
+    counts = list(raw.values())
+    if not clean:
+        highest = columns[0] if ngram == 1 else imap(max, *columns)
+        keep = list(imap(functools.partial(operator.gt, size), highest))
+        columns = [list(itertools.compress(column, keep))
+                   for column in columns]
+        counts = list(itertools.compress(counts, keep))
+    return columns, counts
+
+def _grams(columns, alphabet):
+    """
+    Turns the columns of character codes from _distinct_grams back into the
+    n-grams themselves.
+    """
+    ngram = len(columns)
+    if isinstance(alphabet, str) and alphabet and \
+       max(imap(ord, alphabet)) < 256:
+        # Interleave the columns, translate the codes to characters all at
+        # once, and cut the result up.
+        table = bytearray(256)
+        table[:len(alphabet)] = bytearray(imap(ord, alphabet))
+        buf = bytearray(ngram * len(columns[0]))
+        for k, column in enumerate(columns):
+            buf[k::ngram] = bytearray(column)
+        text = bytes(buf).translate(bytes(table))
+        if not isinstance(text, str):
+            text = text.decode('latin-1')
+        return [text[i:i + ngram] for i in range(0, len(text), ngram)]
+    return imap(''.join, izip(*[imap(alphabet.__getitem__, column)
+                                for column in columns]))
+
+def ngram_counts(text, ngram=1, alphabet=string.ascii_lowercase, dense=False):
+    """
+    Counts the n-grams in a text, ignoring n-grams that contain characters
+    not in the alphabet. text may also be an array returned by encode().
+    Returns a dict mapping n-grams to their counts or, if dense is True, a
+    list of len(alphabet) ** ngram counts indexed by n-gram number (the n-gram
+    read as a number in base len(alphabet), so 'ab' is 1 and 'ba' is 26 for
+    the default alphabet).
+    """
+    if ngram < 1:
+        raise ValueError('N-gram size must be positive!')
+
+    codes = _encoded(text, alphabet)
+    if dense and ngram == 1:
+        return _symbol_counts(codes, len(alphabet))
+    if dense:
+        table = [0] * len(alphabet) ** ngram
+        for i, n in _count_grams(codes, ngram, len(alphabet)).items():
+            table[i] = n
+        return table
+    columns, counts = _distinct_grams(codes, ngram, len(alphabet))
+    return dict(izip(_grams(columns, alphabet), counts))
+
+def frequency_analysis(text, ngram=1, alphabet=None):
     """
     Generates an n-gram frequency table from a source text.
+    If an alphabet is given, n-grams containing other characters are left out;
+    otherwise every character counts. text may also be an array returned by
+    encode(), in which case the alphabet defaults to encode()'s, and n-grams
+    containing characters that weren't in it are left out.
+    """
+    if ngram < 1:
+        raise ValueError('N-gram size must be positive!')
+    if isinstance(text, (str, type(u''))) and \
+       (not _FAST_COUNTER or len(text) < _SHORT):
+        return _sliced_frequencies(text, ngram, alphabet)
+    if alphabet is None:
+        if isinstance(text, array.array):
+            alphabet = string.ascii_lowercase
+        else:
+            alphabet = ''.join(sorted(set(text)))
+    if ngram == 1 and isinstance(text, (str, type(u''))):
+        chars = set(alphabet).intersection(text)
+        if len(chars) <= _FEW:
+            # A few passes of str.count beat counting character by character.
+            counts = dict((c, text.count(c)) for c in chars)
+            return _frequencies(counts) if counts else {}
+
+    # Go straight from the counts to frequencies, without a table of counts
+    # in between.
+    columns, counts = _distinct_grams(_encoded(text, alphabet), ngram,
+                                      len(alphabet))
+    total = float(sum(counts))
+    return dict(izip(_grams(columns, alphabet),
+                     imap(operator.truediv, counts, itertools.repeat(total))))
+
+def _sliced_frequencies(text, ngram, alphabet):
     """
-    freqs, total = collections.defaultdict(int), 0
+    Does what frequency_analysis does by slicing out every n-gram, which is
+    quicker for short texts and wherever Counter is slow.
+    """
+    counts = collections.defaultdict(int)
     for i in range(len(text) - ngram + 1):
-        freqs[text[i:i + ngram]] += 1
-        total += 1
-    for gram in freqs:
-        freqs[gram] /= float(total)
-    return dict(freqs)
+        counts[text[i:i + ngram]] += 1
+    if alphabet is not None:
+        chars = set(alphabet)
+        for gram in [gram for gram in counts if not chars.issuperset(gram)]:
+            del counts[gram]
+    total = float(sum(counts.values()))
+    for gram in counts:
+        counts[gram] /= total
+    return dict(counts)
+
+def stream_frequency_analysis(source, ngram=1, alphabet=None,
+                              chunksize=1 << 20):
+    """
+    Generates the same n-gram frequency table as frequency_analysis, but reads
+    the text a chunk at a time from source, which may be a file object, a path
+    or an iterable of strings.
+    """
+    if ngram < 1:
+        raise ValueError('N-gram size must be positive!')
+
+    counts, overlap = collections.Counter(), None
+    for chunk in _chunks(source, chunksize):
+        # Carry the last ngram - 1 characters over so we don't lose the
+        # n-grams that straddle chunk boundaries.
+        text = chunk if overlap is None else overlap + chunk
+        if text:
+            counts.update(ngram_counts(text, ngram,
+                                       alphabet if alphabet is not None
+                                       else ''.join(sorted(set(text)))))
+        overlap = text[max(len(text) - ngram + 1, 0):]
+    return _frequencies(counts)
+
+def _chunks(source, chunksize):
+    """
+    Yields a text in chunks from a file object, a path, or an iterable of
+    strings.
+    """
+    if isinstance(source, (str, type(u''))):
+        with open(source) as f:
+            for chunk in _chunks(f, chunksize):
+                yield chunk
+    elif hasattr(source, 'read'):
+        chunk = source.read(chunksize)
+        while chunk:
+            yield chunk
+            chunk = source.read(chunksize)
+    else:
+        for chunk in source:
+            yield chunk
+
+def _frequencies(counts):
+    """
+    Turns a table of n-gram counts into a table of frequencies.
+    """
+    total = float(sum(counts.values()))
+    return dict((gram, n / total) for gram, n in counts.items())
 
 def chi2(text, freqs):
     """
@@ -25,19 +331,172 @@ def chi2(text, freqs):
     to a given frequency table. Lower numbers are better.
     freqs should be a table from goldbug.freq.*; for instance, to perform the
     test with respect to English unigrams, use goldbug.freq.english.unigram.
+    To test many texts against the same table, use a Chi2Scorer, which only
+    prepares the table once.
     """
-    acc = 0
-    for c in freqs:
-        e_i = freqs[c] * len(text) / len(c) # Expected incidence
-        c_i = text.count(c)                 # Observed incidence
-        if e_i == 0.0 and c_i == 0:
+    if isinstance(text, (str, type(u''))) and \
+       all(len(gram) == 1 for gram in freqs):
+        # Not worth compiling a unigram table just to look at each letter.
+        return max(_chi2_letters(text, freqs.items(),
+                                 sum(freqs.values())), 0.0)
+    return _chi2(text, _compile_table(freqs))
+
+def chi2_batch(texts, freqs):
+    """
+    Performs chi2 on each of a number of texts with respect to the same
+    frequency table, returning an array of results.
+    """
+    table = _compile_table(freqs)
+    return array.array('d', [_chi2(text, table) for text in texts])
+
+def _chi2(text, table):
+    # We only look at the n-grams that actually occur in the text, using
+    # sum((c - e)**2 / e) = sum(c**2 / e) - 2 * sum(c) + sum(e).
+    acc = 0.0
+    for ngram, alphabet, freqs, total_freq in table:
+        if ngram == 1 and isinstance(text, (str, type(u''))):
+            acc += _chi2_letters(text, ((alphabet[i], f)
+                                        for i, f in freqs.items()),
+                                 total_freq)
             continue
-        elif e_i == 0.0:
-            acc += float('inf')
-        else:
-            acc += (c_i - e_i)**2 / e_i
+        text = _encoded(text, alphabet)
+        counts = _count_grams(text, ngram, len(alphabet))
+        acc += _chi2_counts(counts.items(), len(text) - ngram + 1, freqs,
+                            total_freq)
+    return max(acc, 0.0)
+
+def _chi2_letters(text, freqs, total_freq):
+    """
+    As _chi2_counts, but for a string and (letter, frequency) pairs, which are
+    counted with str.count; that's quicker than encoding the text, for the
+    handful of characters in a unigram table.
+    """
+    total = len(text)
+    if total < 1:
+        return 0.0
+    acc = total * total_freq
+    for c, f in freqs:
+        c_i = text.count(c)
+        if not c_i:
+            continue
+        elif f == 0.0:
+            return float('inf')
+        acc += c_i * c_i / (f * total) - 2 * c_i
+    return acc
+
+def _chi2_counts(counts, total, freqs, total_freq):
+    """
+    Calculates the chi2 statistic from a text's (n-gram index, count) pairs
+    and its number of n-gram positions, without the clamping.
+    """
+    if total < 1:
+        return 0.0
+    acc = total * total_freq
+    for gram, c_i in counts:
+        f = freqs.get(gram)
+        if f is None or not c_i:
+            continue
+        elif f == 0.0:
+            return float('inf')
+        acc += c_i * c_i / (f * total) - 2 * c_i
     return acc
 
+def _compile_table(freqs, alphabet=None):
+    """
+    Prepares a frequency table for scoring. Returns a list of (ngram,
+    alphabet, table, total) tuples, one for each n-gram size in the table,
+    where table maps n-gram indices (as _gram_indices) to frequencies.
+    The alphabet defaults to the characters that occur in the table; n-grams
+    with characters outside it are left out.
+    """
+    if alphabet is None:
+        alphabet = ''.join(sorted(set(''.join(freqs))))
+    lookup = dict((c, i) for i, c in enumerate(alphabet))
+    tables = collections.defaultdict(dict)
+    for gram, f in freqs.items():
+        if all(c in lookup for c in gram):
+            tables[len(gram)][_gram_index(gram, lookup)] = f
+    return [(n, alphabet, tables[n], sum(tables[n].values()))
+            for n in sorted(tables)]
+
+def _gram_index(gram, lookup):
+    """
+    Turns an n-gram into its index, given a mapping from characters to their
+    position in the alphabet.
+    """
+    index = 0
+    for c in gram:
+        index = index * len(lookup) + lookup[c]
+    return index
+
+def score_batch(candidates, freqs=None, scorer=None,
+                alphabet=string.ascii_lowercase):
+    """
+    Scores a batch of candidate plaintexts in one go. candidates is a sequence
+    of strings or of sequences of alphabet indices (as returned by encode()).
+    Returns a tuple of three arrays: chi2 with respect to freqs, the
+    monographic IC, and the log-likelihood according to an NgramScorer. The
+    first and last are None if freqs or scorer aren't given.
+    """
+    # Encode everything at once into one long text, and remember where each
+    # candidate starts.
+    candidates = list(candidates)
+    offsets = [0]
+    for candidate in candidates:
+        offsets.append(offsets[-1] + len(candidate))
+    if candidates and all(isinstance(c, (str, type(u''))) for c in candidates):
+        codes = encode(''.join(candidates), alphabet)
+    else:
+        codes = array.array('B' if len(alphabet) < 256 else 'L')
+        for candidate in candidates:
+            if isinstance(candidate, (str, type(u''))):
+                candidate = encode(candidate, alphabet)
+            codes.extend(candidate)
+    size = len(alphabet)
+    spans = list(zip(offsets, offsets[1:]))
+
+    # Work out the n-gram indices for the whole batch once for each n-gram
+    # size we need. Candidate i's n-grams are then just a slice, and n-grams
+    # straddling two candidates never come into it.
+    indices = {}
+    def grams(ngram, start, end):
+        if ngram not in indices:
+            indices[ngram] = list(_all_gram_indices(codes, ngram, size))
+        limit = functools.partial(operator.gt, size ** ngram)
+        return ifilter(limit, indices[ngram][start:max(end - ngram + 1,
+                                                       start)])
+
+    ics = array.array('d')
+    for start, end in spans:
+        counts = collections.Counter(grams(1, start, end))
+        total = sum(counts.values())
+        if total < 2:
+            ics.append(float('nan'))
+        else:
+            ics.append(sum(fi * (fi - 1) for fi in counts.values()) /
+                       (total * (total - 1) / float(size)))
+
+    chi2s = None
+    if freqs is not None:
+        table = _compile_table(freqs, alphabet)
+        chi2s = array.array('d')
+        for start, end in spans:
+            chi2s.append(max(sum(_chi2_counts(
+                collections.Counter(grams(ngram, start, end)).items(),
+                end - start - ngram + 1, grams_table, total_freq
+            ) for ngram, _, grams_table, total_freq in table), 0.0))
+
+    fitness = None
+    if scorer is not None:
+        if scorer.alphabet != alphabet:
+            raise ValueError("Scorer's alphabet doesn't match!")
+        logp = scorer.table
+        fitness = array.array('d', [sum(imap(logp.__getitem__,
+                                             grams(scorer.ngram, start, end)))
+                                    for start, end in spans])
+
+    return chi2s, ics, fitness
+
 def ic(text, alphabet=string.ascii_lowercase):
     """
     Calculates the index of coincidence for a given piece of text.
@@ -45,21 +504,637 @@ def ic(text, alphabet=string.ascii_lowercase):
     (as goldbug.freq.*.bigrams.keys()), trigrams, &c. for polygraphic IC.
     """
     # Ensure all n-grams are the same size.
+    alphabet = list(alphabet)
     n = len(alphabet[0])
     if any(n != len(gram) for gram in alphabet):
         raise ValueError("N-grams aren't all the same size!")
 
     # Clean input to the extent possible.
-    text = ''.join(c for c in text if c in ''.join(alphabet))
+    chars = ''.join(sorted(set(''.join(alphabet))))
+    codes = encode(text, chars, strip=True)
 
-    # Split the text into n-grams.
-    grams = [text[i:i + n] for i in range(len(text) - n + 1)
-             if text[i:i + n] in alphabet]
-    if len(grams) < 2:
+    # Count the n-grams in one go and look up the ones we're interested in.
+    lookup = dict((c, i) for i, c in enumerate(chars))
+    counts = _count_grams(codes, n, len(chars))
+    total = sum(counts[i] for i in set(_gram_index(gram, lookup)
+                                       for gram in alphabet))
+    if total < 2:
         raise ValueError('Text is too short!')
 
     ic = 0
     for gram in alphabet:
-        fi = grams.count(gram)
+        fi = counts[_gram_index(gram, lookup)]
         ic += fi * (fi - 1)
-    return ic / (len(grams) * (len(grams) - 1) / float(len(alphabet)))
+    return ic / (total * (total - 1) / float(len(alphabet)))
+
+def periodic_ic(text, max_period, alphabet=string.ascii_lowercase,
+                min_period=1):
+    """
+    Calculates the average monographic IC of the columns a text falls into
+    when written out in rows of each length from min_period to max_period,
+    returning a dict mapping periods to ICs. Characters not in the alphabet
+    are ignored. text may also be an array returned by encode().
+    """
+    codes = _clean(_encoded(text, alphabet), len(alphabet))
+    ics = {}
+    # Each period's columns are sliced out and counted with bytes.count. That
+    # reads the text once per period, but at C speed; tallying every period's
+    # columns in a single sweep means a Python-level step per character and
+    # period, which is slower.
+    for period in range(max(min_period, 1), max_period + 1):
+        columns = []
+        for column in range(period):
+            counts = _symbol_counts(codes[column::period], len(alphabet))
+            total = sum(counts)
+            if total >= 2:
+                columns.append(sum(fi * (fi - 1) for fi in counts) /
+                               (total * (total - 1) / float(len(alphabet))))
+        if columns:
+            ics[period] = sum(columns) / len(columns)
+    return ics
+
+def fractionated_periods(text, max_period, dimensions=2,
+                         alphabet=string.ascii_lowercase):
+    """
+    Scores each period from dimensions to max_period (and 0, for none) by how
+    likely it is that a text was encrypted with the Bifid cipher (or, with
+    three dimensions, Trifid) with that period, returning a dict mapping
+    periods to scores; higher is more likely. Characters not in the alphabet
+    are ignored.
+    Within a block of length L, the coordinates of the jth plaintext letter
+    end up in ciphertext letters j // dimensions, (L + j) // dimensions and
+    so on, so at the right period those tuples of letters are far from
+    independent (for even periods of Bifid, they're the plaintext bigrams
+    under another alphabet). Each distinct tuple is counted once, and the
+    score is how far their polygraphic IC is above 1, scaled by the square
+    root of their number.
+    """
+    size = len(alphabet)
+    codes = _clean(_encoded(text, alphabet), size)
+    n = len(codes)
+    scores = {}
+    for period in [0] + list(range(dimensions, max_period + 1)):
+        tuples = set()
+        step = period or max(n, 1)
+        for start in range(0, n, step):
+            length = min(step, n - start)
+            for j in range(length):
+                tuples.add(tuple(start + (k * length + j) // dimensions
+                                 for k in range(dimensions)))
+        counts = collections.Counter(
+            functools.reduce(lambda gram, i: gram * size + codes[i], t, 0)
+            for t in tuples if len(set(t)) == dimensions
+        )
+        total = sum(counts.values())
+        if total >= 2:
+            ic = sum(c * (c - 1) for c in counts.values()) / \
+                 (total * (total - 1) / float(size ** dimensions))
+            scores[period] = (ic - 1) * math.sqrt(total)
+    return scores
+
+def coincidences(text, alphabet=string.ascii_lowercase):
+    """
+    Counts, for every shift s from 0 to half the length of a text, the number
+    of positions i where text[i] == text[i + s], returning an array.
+    Characters not in the alphabet are ignored.
+    """
+    codes = _tobytes(_clean(_encoded(text, alphabet), len(alphabet)))
+    n = len(codes)
+    if n == 0:
+        return array.array('L', [0])
+
+    # For each character, write its indicator sequence (1 where it occurs,
+    # 0 elsewhere) as the digits of a number, spaced far enough apart that
+    # no count can overflow into the next, and multiply it by the same
+    # sequence reversed. The digits of the product are then the sequence's
+    # autocorrelation. Where decimal is libmpdec (Python 3), it multiplies
+    # large numbers with a number-theoretic transform, so this takes
+    # O(n log n). Python 2's decimal is pure Python and far slower than
+    # that, so there the digits are hexadecimal and the numbers plain ints,
+    # which multiply in O(n ** 1.585) with Karatsuba's algorithm.
+    if _LIBMPDEC:
+        base, width = 10, len(str(n))
+        context = decimal.Context(prec=width * 2 * n + 1,
+                                  Emax=width * 2 * n + 1)
+        number, total = decimal.Decimal, decimal.Decimal(0)
+        add, multiply = context.add, context.multiply
+    else:
+        base, width = 16, len('%x' % n)
+        number, total = functools.partial(int, base=16), 0
+        add, multiply = operator.add, operator.mul
+    pad = '0' * (width - 1)
+    for c in set(bytearray(codes)):
+        table = bytearray(b'0' * 256)
+        table[c] = ord('1')
+        digits = codes.translate(bytes(table)).decode('ascii')
+        total = add(total, multiply(number(pad.join(digits)),
+                                    number(pad.join(digits[::-1]))))
+
+    # Shift s lives in the (n - 1 + s)th group of digits from the right.
+    product = (str(total) if _LIBMPDEC else '%x' % total) \
+              .zfill(width * (2 * n - 1))
+    end = len(product) - width * (n - 1)
+    return array.array('L', [int(product[end - width * (s + 1):end - width * s],
+                                 base)
+                             for s in range(n // 2 + 1)])
+
+def repeats(text, length=3):
+    """
+    Finds the substrings of at least the given length that occur more than
+    once in a text. Returns a dict mapping each to a sorted list of the
+    positions where it occurs. Occurrences are grouped by their first length
+    characters; the substring reported for each group is the longest prefix
+    all of its occurrences share.
+    """
+    if length < 1:
+        raise ValueError('Length must be positive!')
+    sa = _suffix_array(text)
+    lcp = _lcp(text, sa)
+
+    found = {}
+    start = 0
+    for i in range(1, len(sa) + 1):
+        if i < len(sa) and lcp[i] >= length:
+            continue
+        if i - start > 1:
+            shared = min(lcp[start + 1:i])
+            found[text[sa[start]:sa[start] + shared]] = sorted(sa[start:i])
+        start = i
+    return found
+
+def kasiski(text, length=3):
+    """
+    Performs the Kasiski examination on a text: finds repeated substrings of
+    at least the given length, and tallies the factors of the distances
+    between successive occurrences of each. Returns a dict mapping factors
+    to their counts. The key length of a periodic polyalphabetic cipher will
+    usually be among the most common factors.
+    """
+    gaps = collections.Counter()
+    for positions in repeats(text, length).values():
+        gaps.update(imap(operator.sub, positions[1:], positions))
+
+    factors = collections.Counter()
+    for gap, count in gaps.items():
+        for f in range(1, int(gap ** .5) + 1):
+            if gap % f == 0:
+                factors[f] += count
+                factors[gap // f] += count
+                if f * f == gap:
+                    factors[f] -= count
+    del factors[1]
+    return dict(factors)
+
+def _suffix_array(text):
+    """
+    Returns the starting positions of a text's suffixes in lexicographical
+    order, by prefix doubling: suffixes are ranked by their first k
+    characters, then by their first 2k (as pairs of ranks), and so on, until
+    all ranks are different.
+    """
+    n = len(text)
+    chars = sorted(set(text))
+    rank = list(imap(dict(zip(chars, range(1, len(chars) + 1))).__getitem__,
+                     text))
+    k = 1
+    while len(set(rank)) < n:
+        # Suffix i's rank for 2k characters follows from its own rank and
+        # that of suffix i + k, which is 0 past the end of the text.
+        keys = list(imap(operator.add,
+                         imap(operator.mul, rank, itertools.repeat(n + 1)),
+                         itertools.chain(rank[k:], [0] * k)))
+        ranked = sorted(set(keys))
+        rank = list(imap(dict(zip(ranked, range(1, n + 1))).__getitem__,
+                         keys))
+        k *= 2
+    return sorted(range(n), key=rank.__getitem__)
+
+def _lcp(text, sa):
+    """
+    Computes the length of the longest common prefix of each suffix in a
+    suffix array and the one before it (Kasai et al.'s algorithm).
+    """
+    n = len(text)
+    rank = [0] * n
+    for i, s in enumerate(sa):
+        rank[s] = i
+
+    lcp = [0] * n
+    h = 0
+    for i in range(n):
+        if rank[i] > 0:
+            j = sa[rank[i] - 1]
+            while i + h < n and j + h < n and text[i + h] == text[j + h]:
+                h += 1
+            lcp[rank[i]] = h
+            if h:
+                h -= 1
+        else:
+            h = 0
+    return lcp
+
+def rolling_ngram_counts(text, window, ngram=1,
+                         alphabet=string.ascii_lowercase):
+    """
+    Slides a window of the given number of characters over a text and yields
+    dense n-gram counts (as ngram_counts) for each offset. Characters not in
+    the alphabet are ignored. The same list is updated and yielded each time.
+    """
+    grams = _window_grams(text, alphabet, ngram)
+    width = _window_width(window, ngram)
+    if len(grams) < width:
+        return
+
+    counts = [0] * len(alphabet) ** ngram
+    for gram in grams[:width]:
+        counts[gram] += 1
+    yield counts
+    for entering, leaving in izip(grams[width:], grams):
+        counts[leaving] -= 1
+        counts[entering] += 1
+        yield counts
+
+def rolling_ic(text, window, alphabet=string.ascii_lowercase):
+    """
+    Calculates the index of coincidence (as ic) of every window of the given
+    number of characters in a text, returning an array. Characters not in the
+    alphabet are ignored, and windows holding fewer than two of the alphabet's
+    n-grams get NaN.
+    """
+    alphabet = list(alphabet)
+    n = len(alphabet[0])
+    if any(n != len(gram) for gram in alphabet):
+        raise ValueError("N-grams aren't all the same size!")
+    chars = ''.join(sorted(set(''.join(alphabet))))
+    lookup = dict((c, i) for i, c in enumerate(chars))
+
+    grams = _window_grams(text, chars, n)
+    width = _window_width(window, n)
+    member = [False] * len(chars) ** n
+    for gram in alphabet:
+        member[_gram_index(gram, lookup)] = True
+
+    # Keep track of sum(f * (f - 1)) as n-grams come and go.
+    counts = [0] * len(chars) ** n
+    acc = total = 0
+    results = array.array('d')
+    for i, gram in enumerate(grams):
+        if member[gram]:
+            acc += 2 * counts[gram]
+            counts[gram] += 1
+            total += 1
+        if i >= width:
+            gram = grams[i - width]
+            if member[gram]:
+                counts[gram] -= 1
+                acc -= 2 * counts[gram]
+                total -= 1
+        if i >= width - 1:
+            if total < 2:
+                results.append(float('nan'))
+            else:
+                results.append(acc / (total * (total - 1) /
+                                      float(len(alphabet))))
+    return results
+
+def rolling_chi2(text, window, freqs):
+    """
+    Performs chi2 on every window of the given number of characters in a text,
+    returning an array. Characters that don't occur in the frequency table are
+    ignored.
+    """
+    results = None
+    for ngram, alphabet, table, total_freq in _compile_table(freqs):
+        grams = _window_grams(text, alphabet, ngram)
+        width = _window_width(window, ngram)
+
+        # 1 / f for each n-gram in the table; None for those that aren't, and
+        # 0 for those that are but shouldn't ever occur.
+        inverse = [None] * len(alphabet) ** ngram
+        for gram, f in table.items():
+            inverse[gram] = 1.0 / f if f else 0
+
+        # As in chi2, the statistic is sum(c**2 / e) - 2 * sum(c) + sum(e);
+        # keep track of sum(c**2 / f) and sum(c) as n-grams come and go.
+        counts = [0] * len(alphabet) ** ngram
+        acc = observed = impossible = 0
+        scores = array.array('d')
+        for i, gram in enumerate(grams):
+            if inverse[gram]:
+                acc += (2 * counts[gram] + 1) * inverse[gram]
+                observed += 1
+            elif inverse[gram] == 0:
+                impossible += 1
+            counts[gram] += 1
+            if i >= width:
+                gram = grams[i - width]
+                counts[gram] -= 1
+                if inverse[gram]:
+                    acc -= (2 * counts[gram] + 1) * inverse[gram]
+                    observed -= 1
+                elif inverse[gram] == 0:
+                    impossible -= 1
+            if i >= width - 1:
+                if impossible:
+                    scores.append(float('inf'))
+                else:
+                    scores.append(max(acc / width - 2 * observed +
+                                      width * total_freq, 0.0))
+
+        if results is None:
+            results = scores
+        else:
+            results = array.array('d', imap(operator.add, results, scores))
+    return results if results is not None else array.array('d')
+
+class NgramScorer(object):
+    """
+    Scores potential plaintexts by their log-likelihood with respect to an
+    n-gram frequency table. Higher numbers are better.
+
+    The table is turned into a flat list of log-probabilities indexed by
+    n-gram number once, so scoring a text is a matter of encoding it and
+    adding up the entries for its n-grams.
+    """
+    def __init__(self, freqs, alphabet=string.ascii_lowercase, floor=None):
+        """
+        freqs should be a table from goldbug.freq.*, all of whose n-grams are
+        the same size and made up of characters from the alphabet.
+        floor is the probability given to n-grams the table doesn't have (or
+        gives as 0); by default, a tenth of the lowest one it does have.
+        """
+        self.freqs = freqs
+        self.alphabet = alphabet
+        self.ngram = len(next(iter(freqs)))
+        if any(self.ngram != len(gram) for gram in freqs):
+            raise ValueError("N-grams aren't all the same size!")
+
+        lookup = dict((c, i) for i, c in enumerate(alphabet))
+        if not all(c in lookup for gram in freqs for c in gram):
+            raise ValueError('Table has characters not in the alphabet!')
+
+        total = float(sum(freqs.values()))
+        if floor is None:
+            floor = min(f for f in freqs.values() if f > 0) / total / 10
+        self.floor = math.log(floor)
+
+        self.table = [self.floor] * len(alphabet) ** self.ngram
+        for gram, f in freqs.items():
+            if f > 0:
+                self.table[_gram_index(gram, lookup)] = math.log(f / total)
+
+    def score(self, text):
+        """
+        Returns the sum of the log-probabilities of the text's n-grams. text
+        may also be an array returned by encode(). N-grams containing
+        characters outside the alphabet are skipped.
+        """
+        codes = _encoded(text, self.alphabet)
+        return sum(imap(self.table.__getitem__,
+                        _gram_indices(codes, self.ngram, len(self.alphabet))))
+
+    def __repr__(self):
+        return '%s(<%d %d-grams>, alphabet=%r)' % (self.__class__.__name__,
+                                                   len(self.freqs), self.ngram,
+                                                   self.alphabet)
+
+class Chi2Scorer(object):
+    """
+    Performs chi2 on potential plaintexts with respect to a fixed frequency
+    table. Lower numbers are better.
+
+    The table is prepared once, when the scorer is created, rather than on
+    every call as chi2 does, so it shouldn't be changed afterwards.
+    """
+    def __init__(self, freqs, alphabet=None):
+        """
+        freqs should be a table from goldbug.freq.*.
+        alphabet defaults to the characters that occur in the table; n-grams
+        with characters outside it are left out.
+        """
+        if alphabet is None:
+            alphabet = ''.join(sorted(set(''.join(freqs))))
+        self.freqs = freqs
+        self.alphabet = alphabet
+        self.table = _compile_table(freqs, alphabet)
+
+    def score(self, text):
+        """
+        Returns the text's chi2 statistic, as chi2(text, freqs). text may
+        also be an array returned by encode() with the scorer's alphabet.
+        """
+        return _chi2(text, self.table)
+
+    def score_counts(self, counts, total=None):
+        """
+        Returns the chi2 statistic of a text from its dense n-gram counts, as
+        ngram_counts(text, n, alphabet, dense=True), and its number of n-gram
+        positions (by default, the sum of the counts). The table must only
+        have n-grams of one size.
+        """
+        if len(self.table) != 1:
+            raise ValueError("N-grams aren't all the same size!")
+        ngram, alphabet, freqs, total_freq = self.table[0]
+        if total is None:
+            total = sum(counts)
+        return max(_chi2_counts(enumerate(counts), total, freqs, total_freq),
+                   0.0)
+
+    def __repr__(self):
+        return '%s(<%d n-grams>, alphabet=%r)' % (self.__class__.__name__,
+                                                  len(self.freqs),
+                                                  self.alphabet)
+
+class SubstitutionScorer(object):
+    """
+    Keeps track of the fitness (as NgramScorer) of the decryption of a fixed
+    ciphertext under a monoalphabetic substitution key that changes one swap
+    at a time, without ever decrypting the ciphertext.
+
+    The ciphertext's n-grams are counted once. Since swapping two plaintext
+    letters only affects the n-grams containing the ciphertext characters
+    that decrypt to them, the change in fitness can be worked out from those
+    alone, regardless of the length of the text. The same goes for making a
+    single ciphertext character decrypt to another letter.
+    """
+    def __init__(self, scorer, ciphertext, key=None, alphabet=None):
+        """
+        scorer is an NgramScorer.
+        alphabet is the ciphertext alphabet (by default, the same as the
+        scorer's); other characters are ignored.
+        key maps each character of the ciphertext alphabet to a plaintext
+        letter, as a dict or as a string in the same order as the alphabet. By
+        default, each letter maps to itself.
+        """
+        self.scorer = scorer
+        self.alphabet = alphabet if alphabet is not None else scorer.alphabet
+        self._plain = dict((c, i) for i, c in enumerate(scorer.alphabet))
+        self._cipher = dict((c, i) for i, c in enumerate(self.alphabet))
+        self._key = self.__codes(key if key is not None else self.alphabet)
+        self._symbols = [[] for _ in scorer.alphabet]
+        for s, p in enumerate(self._key):
+            self._symbols[p].append(s)
+
+        # Count the distinct ciphertext n-grams and index them by the
+        # characters they contain.
+        n, size = scorer.ngram, len(self.alphabet)
+        counts = _count_grams(encode(ciphertext, self.alphabet), n, size)
+        self._grams, self._counts = [], []
+        self._by_symbol = [[] for _ in self.alphabet]
+        for index, count in counts.items():
+            gram = []
+            for _ in range(n):
+                index, c = divmod(index, size)
+                gram.append(c)
+            gram.reverse()
+            for c in set(gram):
+                self._by_symbol[c].append(len(self._grams))
+            self._grams.append(tuple(gram))
+            self._counts.append(count)
+
+        self.fitness = self.score(self._key)
+
+    def delta(self, a, b):
+        """
+        Returns the change in fitness that swapping plaintext letters a and b
+        would cause.
+        """
+        a, b = self._plain[a], self._plain[b]
+        if a == b:
+            return 0.0
+
+        affected = set()
+        for s in self._symbols[a] + self._symbols[b]:
+            affected.update(self._by_symbol[s])
+        swapped = [b if p == a else a if p == b else p for p in self._key]
+        return self.__score(affected, swapped) - \
+               self.__score(affected, self._key)
+
+    def swap(self, a, b, delta=None):
+        """
+        Swaps plaintext letters a and b in the key and updates the fitness.
+        If you already know the delta, pass it in to avoid recomputing it.
+        """
+        if delta is None:
+            delta = self.delta(a, b)
+        a, b = self._plain[a], self._plain[b]
+        symbols = self._symbols
+        for s in symbols[a]:
+            self._key[s] = b
+        for s in symbols[b]:
+            self._key[s] = a
+        symbols[a], symbols[b] = symbols[b], symbols[a]
+        self.fitness += delta
+
+    def assign_delta(self, c, p):
+        """
+        Returns the change in fitness that decrypting ciphertext character c
+        to plaintext letter p instead would cause. Unlike a swap, this can
+        leave several characters decrypting to the same letter, as in a
+        homophonic cipher.
+        """
+        s, p = self._cipher[c], self._plain[p]
+        if self._key[s] == p:
+            return 0.0
+        affected = self._by_symbol[s]
+        assigned = self._key[:]
+        assigned[s] = p
+        return self.__score(affected, assigned) - \
+               self.__score(affected, self._key)
+
+    def assign(self, c, p, delta=None):
+        """
+        Makes ciphertext character c decrypt to plaintext letter p and updates
+        the fitness. If you already know the delta, pass it in to avoid
+        recomputing it.
+        """
+        if delta is None:
+            delta = self.assign_delta(c, p)
+        s, p = self._cipher[c], self._plain[p]
+        self._symbols[self._key[s]].remove(s)
+        self._symbols[p].append(s)
+        self._key[s] = p
+        self.fitness += delta
+
+    @property
+    def key(self):
+        """
+        The current key, as a dict mapping ciphertext characters to plaintext
+        letters.
+        """
+        return dict((c, self.scorer.alphabet[p])
+                    for c, p in zip(self.alphabet, self._key))
+
+    def score(self, key):
+        """
+        Returns the fitness the decryption would have under another key, given
+        as to the constructor or as a list of plaintext letter indices, without
+        changing the current one.
+        """
+        if not isinstance(key, list):
+            key = self.__codes(key)
+        return self.__score(range(len(self._grams)), key)
+
+    def __codes(self, key):
+        """
+        Turns a key as given to the constructor into a list of plaintext letter
+        indices, one for each character of the ciphertext alphabet.
+        """
+        if not isinstance(key, dict):
+            key = dict(zip(self.alphabet, key))
+        if set(key) != set(self.alphabet):
+            raise ValueError('Key must cover the ciphertext alphabet!')
+        return [self._plain[key[c]] for c in self.alphabet]
+
+    def __score(self, grams, key):
+        """
+        Adds up the log-probabilities of the given ciphertext n-grams, decrypted
+        with the given key (as a list of plaintext letter indices).
+        """
+        table = self.scorer.table
+        size = len(self.scorer.alphabet)
+        acc = 0.0
+        for g in grams:
+            index = 0
+            for c in self._grams[g]:
+                index = index * size + key[c]
+            acc += self._counts[g] * table[index]
+        return acc
+
+def _window_grams(text, alphabet, ngram):
+    """
+    Lists the n-gram indices of a text, ignoring characters not in the
+    alphabet.
+    """
+    codes = _clean(_encoded(text, alphabet), len(alphabet))
+    return list(_gram_indices(codes, ngram, len(alphabet)))
+
+def _window_width(window, ngram):
+    """
+    Returns the number of n-grams in a window of the given length.
+    """
+    if window - ngram + 1 < 1:
+        raise ValueError('Window is too small!')
+    return window - ngram + 1
+
+def _clean(codes, size):
+    """
+    Removes characters outside the alphabet from an encoded text.
+    """
+    if codes.typecode == 'B':
+        return array.array('B', _tobytes(codes).translate(
+            None, bytes(bytearray([size]))
+        ))
+    return array.array(codes.typecode,
+                       ifilter(functools.partial(operator.gt, size), codes))
+
+def _symbol_counts(codes, size):
+    """
+    Counts how often each alphabet index occurs in an encoded text, returning
+    a list.
+    """
+    if codes.typecode == 'B':
+        text = _tobytes(codes)
+        return [text.count(c) for c in _BYTES[:size]]
+    counts = collections.Counter(codes)
+    return [counts[i] for i in range(size)]
@@ -53,11 +53,15 @@ class MonoalphabeticSubstitutionCipher(Cipher):
     def decrypt(self, text):
         """
         Decrypts the given text. Ciphertext case will be preserved in the
-        plaintext, to the extent that this makes sense.
+        plaintext, to the extent that this makes sense. Uppercase characters
+        that are in the mapping in their own right (as in a homophonic cipher
+        using both cases) are decrypted as they are.
         """
+        mapping = self.decrypt_mapping
         return type(text)('').join(
+            mapping[c] if c.isupper() and c in mapping else
             (lambda c: c.lower(), lambda c: c.upper())[c.isupper()]\
-            (self.decrypt_mapping.get(c.lower(), c)) for c in text
+            (mapping.get(c.lower(), c)) for c in text
         )
 
 
@@ -1181,9 +1185,8 @@ class Bifid(Cipher):
         Transforms plaintext into ciphertext.
         """
         if self.period > 0:
-            blocks = (self.__encrypt_block(text[i * self.period
-                                               :(i + 1) * self.period])
-                           for i in range(len(text) // self.period + 1))
+            blocks = (self.__encrypt_block(text[i:i + self.period])
+                      for i in range(0, len(text), self.period))
             return ''.join(blocks)
         else:
             return self.__encrypt_block(text)
@@ -1193,9 +1196,8 @@ class Bifid(Cipher):
         Transforms ciphertext into plaintext.
         """
         if self.period > 0:
-            blocks = (self.__decrypt_block(text[i * self.period
-                                               :(i + 1) * self.period])
-                           for i in range(len(text) // self.period + 1))
+            blocks = (self.__decrypt_block(text[i:i + self.period])
+                      for i in range(0, len(text), self.period))
             return ''.join(blocks)
         else:
             return self.__decrypt_block(text)
@@ -0,0 +1,1738 @@
+#!/usr/bin/env python
+
+"""
+Automated attacks on the ciphers in goldbug.cipher. Solvers return a list of
+(score, cipher) tuples, best first, except for solve_hill, which works from
+known plaintext and returns the one cipher that fits.
+"""
+
+import array
+import bisect
+import collections
+import functools
+import heapq
+import itertools
+import math
+import multiprocessing
+import operator
+import random
+import string
+
+
+from . import analysis
+from . import cipher
+from . import util
+from .freq import english
+
+# Built the first time a solver needs a default n-gram scorer.
+_scorer = None
+
+# Rail fence decryptions, as gathers kept by (rails, length).
+_rail_fences = {}
+
+# How many rail fence decryptions to keep before starting afresh.
+_RAIL_FENCES = 1 << 10
+
+# The most rails break_railfence tries unless told otherwise.
+_RAILS = 100
+
+# How many candidate decryptions to score with score_batch at a time.
+_BATCH = 64
+
+# The fewest letters a column can have for its key letter to be worth
+# guessing at.
+_COLUMN = 6
+
+# The least improvement in fitness a hill-climber will take, so rounding
+# errors can't send it round in circles.
+_EPSILON = 1e-9
+
+# How many random swaps a hill-climber kicks a key with to get it out of a
+# local optimum.
+_KICK = 3
+
+# How much of a long text to score when comparing nearly identical keys.
+_SAMPLE = 1 << 10
+
+# How many keys a process tries at a time when sweeping a whole key space.
+_SHARD = 1 << 15
+
+# How much of a ciphertext to score when sweeping a key space; the best keys
+# are then scored on all of it.
+_SWEEP = 100
+
+
+def break_caesar(ciphertext, freqs=english.unigram, top=None):
+    """
+    Breaks the Caesar cipher (ROT13 included) by counting the ciphertext's
+    letters once and scoring every shift by rotating the counts against a
+    unigram frequency table with chi2. Scores are the same as chi2 on each
+    decryption of the lowercased ciphertext; lower is better.
+    Returns the top (by default, all) (chi2, Caesar) tuples.
+    """
+    alphabet = string.ascii_lowercase
+    text = ciphertext.lower()
+    counts = analysis.ngram_counts(text, 1, alphabet, dense=True)
+    chi2 = analysis.Chi2Scorer(freqs, alphabet)
+    results = [(chi2.score_counts(rotated, len(text)), cipher.Caesar(key))
+               for key, rotated in enumerate(_rotations(counts))]
+    return _ranked(results, False, top)
+
+def break_affine(ciphertext, alphabet=string.ascii_lowercase,
+                 freqs=english.unigram, scorer=None, top=10):
+    """
+    Breaks the affine cipher by trying every key (a, b) with a prime relative
+    to the length of the alphabet. The ciphertext is only counted once; each
+    key is applied as a permutation of the counts. Keys are scored with chi2
+    against a unigram table (lower is better) or, if an NgramScorer for the
+    same alphabet is given, by fitness (higher is better).
+    Returns the top (by default, 10) (score, Affine) tuples.
+    """
+    alphabet = alphabet.lower()
+    text = ciphertext.lower()
+    size = len(alphabet)
+    keys = [(a, b) for a in range(1, size) if _coprime(a, size)
+            for b in range(size)]
+    perms = [[(a * p + b) % size for p in range(size)] for a, b in keys]
+
+    if scorer is None:
+        counts = analysis.ngram_counts(text, 1, alphabet, dense=True)
+        chi2 = analysis.Chi2Scorer(freqs, alphabet)
+        scores = [chi2.score_counts([counts[p] for p in perm], len(text))
+                  for perm in perms]
+    else:
+        if scorer.alphabet != alphabet:
+            raise ValueError("Scorer's alphabet doesn't match!")
+        subst = analysis.SubstitutionScorer(scorer, text)
+        scores = [subst.score(_inverse(perm)) for perm in perms]
+
+    results = [(score, cipher.Affine(key, alphabet))
+               for key, score in zip(keys, scores)]
+    return _ranked(results, scorer is not None, top)
+
+def break_hill(ciphertext, size=2, alphabet=string.ascii_lowercase,
+               freqs=english.unigram, scorer=None, candidates=None, top=10):
+    """
+    Breaks the Hill cipher with a key of the given size from the ciphertext
+    alone. Each row of the inverse key decrypts one letter of every block by
+    itself, so rather than trying every key, every row is scored by the
+    unigram fitness of the letters it decrypts to. Rows are built up one
+    entry at a time, so each costs an addition and a lookup per block. The
+    best few rows (by default, twice the size) are then put together in
+    every order, and the keys they make are scored by n-gram fitness (by
+    default, with English trigrams).
+    The ciphertext is lowercased, and characters not in the alphabet are
+    ignored, as is a last partial block.
+    Returns the top (by default, 10) (fitness, Hill) tuples, for invertible
+    keys only.
+    """
+    scorer = _scorer_for(scorer, alphabet)
+    modulus = len(alphabet)
+    codes = analysis.encode(ciphertext.lower(), alphabet, strip=True)
+    codes = codes[:len(codes) - len(codes) % size]
+    if not codes:
+        return []
+    if candidates is None:
+        candidates = 2 * size
+
+    unigrams = analysis.NgramScorer(freqs, alphabet)
+    rows = _hill_rows(codes, size, modulus, unigrams, candidates)
+    # The letters each row decrypts the blocks to.
+    decrypted = dict((row, array.array(codes.typecode, [
+        sum(r * c for r, c in zip(row, codes[i:i + size])) % modulus
+        for i in range(0, len(codes), size)])) for row in rows)
+
+    plaintext, results = codes[:], []
+    for inverse in itertools.permutations(rows, size):
+        for i, row in enumerate(inverse):
+            plaintext[i::size] = decrypted[row]
+        results.append((scorer.score(plaintext), inverse))
+    results.sort(reverse=True)
+
+    found = []
+    for fitness, inverse in results:
+        if top is not None and len(found) == top:
+            break
+        try:
+            key = pow(util.Matrix([list(row) for row in inverse]), -1, modulus)
+        except ValueError:
+            continue
+        found.append((fitness, cipher.Hill(key, alphabet)))
+    return found
+
+def _hill_rows(codes, size, modulus, unigrams, candidates):
+    """
+    Returns the candidates rows of an inverse Hill key whose decryptions of
+    the ciphertext blocks are most likely according to a unigram scorer,
+    best first. Rows whose entries share a factor with the modulus can't be
+    part of an invertible key, and are left out.
+    """
+    columns = [list(codes[j::size]) for j in range(size)]
+    products = [[[x * c for c in column] for x in range(modulus)]
+                for column in columns]
+    # The log-probability of each letter, by the sum of products for it.
+    table = [unigrams.table[v % modulus]
+             for v in range(size * (modulus - 1) ** 2 + 1)]
+    best = []
+
+    def search(row, sums, divisor):
+        last = len(row) == size - 1
+        for x in range(modulus):
+            common = _gcd(divisor, x)
+            if not last:
+                search(row + (x,), list(map(operator.add, sums,
+                                            products[len(row)][x])), common)
+            elif common == 1:
+                score = sum(map(table.__getitem__,
+                                map(operator.add, sums, products[-1][x])))
+                if len(best) < candidates:
+                    heapq.heappush(best, (score, row + (x,)))
+                elif score > best[0][0]:
+                    heapq.heapreplace(best, (score, row + (x,)))
+
+    search((), [0] * len(columns[0]), modulus)
+    return [row for _, row in sorted(best, reverse=True)]
+
+def solve_hill(plaintext, ciphertext, size=2, alphabet=string.ascii_lowercase):
+    """
+    Recovers a Hill key of the given size from a known plaintext and its
+    ciphertext. A matrix is invertible modulo the length of the alphabet
+    just when it is modulo each prime dividing it, so the key is found
+    modulo each prime power in turn: blocks whose plaintext is independent
+    of the ones before modulo the prime are picked out greedily by row
+    reduction, which looks at each block once, until there are size of
+    them. The key is then the matrix of their ciphertext times the inverse
+    of their plaintext's, and the keys for each prime power are put
+    together with the Chinese remainder theorem and checked against every
+    block. Both texts are lowercased, and characters not in the alphabet are
+    ignored.
+    Returns a Hill cipher, or raises a ValueError if there's none.
+    """
+    modulus = len(alphabet)
+    plain = analysis.encode(plaintext.lower(), alphabet, strip=True)
+    codes = analysis.encode(ciphertext.lower(), alphabet, strip=True)
+    if len(plain) != len(codes):
+        raise ValueError('Plaintext and ciphertext lengths differ!')
+    blocks = [(list(plain[i:i + size]), list(codes[i:i + size]))
+              for i in range(0, len(codes) - size + 1, size)]
+
+    values, combined = [[0] * size for _ in range(size)], 1
+    for prime, power in _prime_powers(modulus):
+        chosen = _independent([block for block, _ in blocks], size, prime)
+        if chosen is None:
+            raise ValueError('Not enough known plaintext!')
+        # Blocks are columns.
+        known, encrypted = [util.Matrix([list(row) for row in zip(*side)])
+                            for side in zip(*[blocks[i] for i in chosen])]
+        part = encrypted * pow(known, -1, power) % power
+        step = util.mmi(combined, power)
+        for row, new in zip(values, part.values):
+            for j, x in enumerate(new):
+                row[j] += combined * ((x - row[j]) * step % power)
+        combined *= power
+
+    key = util.Matrix(values)
+    if any([sum(k * x for k, x in zip(row, block)) % modulus
+            for row in key.values] != encrypted_block
+           for block, encrypted_block in blocks):
+        raise ValueError('Plaintext and ciphertext are inconsistent!')
+    return cipher.Hill(key, alphabet)
+
+def _prime_powers(n):
+    """
+    Factorises n, returning a list of (prime, prime power) tuples.
+    """
+    factors, p = [], 2
+    while p * p <= n:
+        if n % p == 0:
+            power = 1
+            while n % p == 0:
+                n //= p
+                power *= p
+            factors.append((p, power))
+        p += 1
+    if n > 1:
+        factors.append((n, n))
+    return factors
+
+def _independent(vectors, size, prime):
+    """
+    Picks out the indices of size vectors that are linearly independent
+    modulo a prime, taking each vector in turn if it's independent of those
+    already picked, or returns None if there aren't that many. Picked
+    vectors are kept reduced, each with a 1 in a position where the ones
+    after it have 0, so checking a vector takes O(size ** 2).
+    """
+    basis, chosen = [], []
+    for index, vector in enumerate(vectors):
+        vector = [x % prime for x in vector]
+        for pivot, row in basis:
+            if vector[pivot]:
+                f = vector[pivot]
+                vector = [(a - f * b) % prime for a, b in zip(vector, row)]
+        pivot = next((j for j, x in enumerate(vector) if x), None)
+        if pivot is None:
+            continue
+        f = util.mmi(vector[pivot], prime)
+        basis.append((pivot, [x * f % prime for x in vector]))
+        chosen.append(index)
+        if len(chosen) == size:
+            return chosen
+    return None
+
+def linear_schedule(i, iterations, temperature):
+    """
+    The default annealing schedule: the temperature at iteration i of
+    iterations, falling linearly from the starting temperature to 0.
+    """
+    return temperature * (1 - i / float(iterations))
+
+def break_playfair(ciphertext, iterations=400000, temperature=20.0,
+                   restarts=4, omitted={'j': 'i'}, scorer=None, processes=None,
+                   seed=0, schedule=linear_schedule):
+    """
+    Breaks the Playfair cipher by simulated annealing. Each restart starts
+    from a random square, held as a list of letters by position, and makes
+    the usual moves: mostly swapping two letters, sometimes swapping two rows
+    or columns, or flipping or transposing the square (a transposed square
+    decrypts to nearly the right letters, but with most pairs backwards).
+    Moves that improve the trigram fitness of the decryption are always
+    taken, others with a probability depending on how much worse they are
+    and on the temperature, which schedule works out from the iteration, the
+    number of iterations and the starting temperature (by default, falling
+    linearly from it to 0, as linear_schedule). Even so, restarts can get
+    stuck: with a few hundred letters, expect about half of them to find the
+    key.
+    Decrypting needs no Polybius lookups: where each pair of positions in a
+    square decrypts to doesn't depend on the key, so it's tabulated once,
+    and the ciphertext is reduced to counts of consecutive pairs of distinct
+    digraphs, since each trigram falls within two of them.
+    Restarts are spread over processes as in break_substitution.
+    Returns (fitness, Playfair) tuples for the distinct squares found.
+    """
+    scorer = _scorer_for(scorer)
+    if scorer.ngram != 3:
+        raise ValueError('Scorer must use trigrams!')
+    alphabet = cipher.Playfair('', omitted=omitted).alphabet
+    if not all(c in scorer.alphabet for c in alphabet):
+        raise ValueError("Scorer's alphabet doesn't match!")
+
+    text = [omitted.get(c, c) for c in ciphertext.lower()]
+    codes = analysis.encode(''.join(text), alphabet, strip=True)
+    if len(codes) % 2 != 0:
+        raise ValueError('Ciphertext of uneven length!')
+    pairs = list(zip(codes[::2], codes[1::2]))
+    if any(a == b for a, b in pairs):
+        raise ValueError('Invalid ciphertext!')
+    digraphs = [a * 25 + b for a, b in pairs]
+
+    tasks = [(scorer, alphabet, digraphs, iterations, temperature, schedule,
+              seed + i) for i in range(restarts)]
+    found = dict((tuple(square), fitness) for fitness, square
+                 in _map(_playfair_anneal, tasks, processes))
+    return _ranked([(fitness, cipher.Playfair(''.join(alphabet[c]
+                                                      for c in square),
+                                              omitted=omitted))
+                    for square, fitness in found.items()], True)
+
+# Where each pair of distinct positions in a Playfair square decrypts to,
+# indexed by first position * 25 + second position.
+_PLAYFAIR = []
+for _a in range(25):
+    for _b in range(25):
+        (_r1, _c1), (_r2, _c2) = divmod(_a, 5), divmod(_b, 5)
+        if _r1 == _r2:
+            _PLAYFAIR.append((_r1 * 5 + (_c1 - 1) % 5,
+                              _r2 * 5 + (_c2 - 1) % 5))
+        elif _c1 == _c2:
+            _PLAYFAIR.append(((_r1 - 1) % 5 * 5 + _c1,
+                              (_r2 - 1) % 5 * 5 + _c2))
+        else:
+            _PLAYFAIR.append((_r1 * 5 + _c2, _r2 * 5 + _c1))
+
+def _playfair_anneal(args):
+    """
+    Anneals a Playfair square from a random starting point, returning the
+    best fitness and (canonical) square found.
+    """
+    scorer, alphabet, digraphs, iterations, temperature, schedule, seed = args
+    rng = random.Random(seed)
+    square = list(range(25))
+    rng.shuffle(square)
+    fitness, square = _anneal(_playfair_fitness(scorer, alphabet, digraphs),
+                              _playfair_move, square, iterations, temperature,
+                              schedule, rng)
+    return fitness, _playfair_canonical(square)
+
+def _anneal(fitness, move, key, iterations, temperature, schedule, rng):
+    """
+    Makes the given number of random moves from a key, always taking those
+    that improve its fitness, and others with a probability depending on how
+    much worse they are and on the temperature, which schedule works out
+    from the iteration, the number of iterations and the starting
+    temperature. Returns the best fitness and key found.
+    """
+    score = fitness(key)
+    best = score, key
+    for i in range(iterations):
+        t = schedule(i, iterations, temperature)
+        trial = move(key, rng)
+        trial_score = fitness(trial)
+        if trial_score >= score or \
+           t > 0 and rng.random() < math.exp((trial_score - score) / t):
+            key, score = trial, trial_score
+            if score > best[0]:
+                best = score, key
+    return best
+
+def _playfair_fitness(scorer, alphabet, digraphs):
+    """
+    Returns a function that works out the trigram fitness of the decryption
+    of a digraph-coded Playfair ciphertext under a square.
+    """
+    size = len(scorer.alphabet)
+    letters = [scorer.alphabet.index(c) for c in alphabet]
+    distinct, pairs = _digraph_pairs(digraphs)
+    firsts, seconds = [d // 25 for d in distinct], [d % 25 for d in distinct]
+
+    def fitness(square):
+        where = [0] * 25
+        for p, c in enumerate(square):
+            where[c] = p
+        plain = [letters[c] for c in square]
+        # Each digraph's plaintext, as a bigram number.
+        bigrams = []
+        for a, b in zip(firsts, seconds):
+            x, y = _PLAYFAIR[where[a] * 25 + where[b]]
+            bigrams.append(plain[x] * size + plain[y])
+        return _digraph_fitness(scorer, bigrams, pairs)
+    return fitness
+
+def _digraph_pairs(digraphs):
+    """
+    Boils a list of digraph numbers down to the distinct digraphs, in order,
+    and (pair, count) tuples for each pair of them that follow each other,
+    by their places in that list.
+    """
+    distinct = sorted(set(digraphs))
+    local = dict((d, i) for i, d in enumerate(distinct))
+    counts = collections.Counter((local[a], local[b])
+                                 for a, b in zip(digraphs, digraphs[1:]))
+    return distinct, list(counts.items())
+
+def _digraph_fitness(scorer, bigrams, pairs):
+    """
+    Works out the trigram fitness of a text from the bigram numbers that
+    each of its distinct digraphs decrypts to and the counts of pairs of
+    consecutive digraphs (as _digraph_pairs), since every trigram falls
+    within two of them.
+    """
+    table, size = scorer.table, len(scorer.alphabet)
+    square = size * size
+    return sum(n * (table[bigrams[a] * size + bigrams[b] // size] +
+                    table[bigrams[a] % size * square + bigrams[b]])
+               for (a, b), n in pairs)
+
+def _playfair_move(square, rng):
+    """
+    Returns a copy of a Playfair square with a random change made to it.
+    """
+    square = square[:]
+    move = rng.random()
+    if move < 0.9:
+        a, b = rng.sample(range(25), 2)
+        square[a], square[b] = square[b], square[a]
+    elif move < 0.92:
+        a, b = rng.sample(range(5), 2)
+        square[a * 5:a * 5 + 5], square[b * 5:b * 5 + 5] = \
+            square[b * 5:b * 5 + 5], square[a * 5:a * 5 + 5]
+    elif move < 0.94:
+        a, b = rng.sample(range(5), 2)
+        square[a::5], square[b::5] = square[b::5], square[a::5]
+    elif move < 0.96:
+        square = [square[(4 - i // 5) * 5 + i % 5] for i in range(25)]
+    elif move < 0.98:
+        square = [square[i // 5 * 5 + 4 - i % 5] for i in range(25)]
+    else:
+        square = [square[c * 5 + r] for r in range(5) for c in range(5)]
+    return square
+
+def _playfair_canonical(square):
+    """
+    Shifts a Playfair square's rows and columns round so that the first
+    letter of the alphabet is in the top left corner, which doesn't change
+    the cipher.
+    """
+    r, c = divmod(square.index(0), 5)
+    return [square[(i // 5 + r) % 5 * 5 + (i % 5 + c) % 5] for i in range(25)]
+
+def break_foursquare(ciphertext, iterations=200000, temperature=20.0,
+                     restarts=4, alphabet='abcdefghiklmnopqrstuvwxyz',
+                     scorer=None, processes=None, seed=0,
+                     schedule=linear_schedule):
+    """
+    Breaks the four-square cipher by simulated annealing, as break_playfair,
+    over both key squares at once: each move changes one of them, mostly
+    by swapping two letters.
+    The squares are held as one list of letters by position, and what each
+    distinct ciphertext digraph decrypts to is kept in a table. Since a
+    digraph's plaintext only depends on where its first letter is in the
+    first square and its second in the second, a move only means working
+    out the entries for the letters it moves again.
+    Characters not in the alphabet are ignored.
+    Returns (fitness, FourSquare) tuples for the distinct keys found, with
+    the alphabet in order as the plaintext square.
+    """
+    found = _break_squares(ciphertext, None, iterations, temperature,
+                           schedule, restarts, alphabet, scorer, processes,
+                           seed)
+    plain = util.Polybius('', alphabet)
+    return _ranked([(fitness, cipher.FourSquare(keys, plain))
+                    for keys, fitness in found], True)
+
+def break_twosquare(ciphertext, horizontal=False, iterations=200000,
+                    temperature=20.0, restarts=4,
+                    alphabet='abcdefghiklmnopqrstuvwxyz', scorer=None,
+                    processes=None, seed=0, schedule=linear_schedule):
+    """
+    Breaks the two-square cipher, arranged horizontally or vertically, as
+    break_foursquare. Here a digraph's plaintext also depends on what's in
+    its letters' rows (or, arranged horizontally, columns) of the squares,
+    so a move means working out the entries for all the letters in the
+    rows or columns it touches again. It takes a good deal more text than
+    the four-square cipher to break.
+    Shuffling the rows of either square (or, arranged horizontally, the
+    columns) doesn't change the cipher, nor does shuffling the columns (or
+    rows) of both the same way, so keys are returned in a canonical order.
+    Returns (fitness, TwoSquare) tuples for the distinct keys found.
+    """
+    found = _break_squares(ciphertext, bool(horizontal), iterations,
+                           temperature, schedule, restarts, alphabet, scorer,
+                           processes, seed)
+    return _ranked([(fitness, cipher.TwoSquare(keys, horizontal))
+                    for keys, fitness in found], True)
+
+def _break_squares(ciphertext, horizontal, iterations, temperature, schedule,
+                   restarts, alphabet, scorer, processes, seed):
+    """
+    Does the work of break_foursquare (if horizontal is None) and
+    break_twosquare, returning a list of ((Polybius, Polybius), fitness)
+    tuples for the distinct keys found.
+    """
+    scorer = _scorer_for(scorer)
+    if scorer.ngram != 3:
+        raise ValueError('Scorer must use trigrams!')
+    if len(alphabet) != 25:
+        raise ValueError('Alphabet must have 25 letters!')
+    if not all(c in scorer.alphabet for c in alphabet):
+        raise ValueError("Scorer's alphabet doesn't match!")
+
+    codes = analysis.encode(ciphertext.lower(), alphabet, strip=True)
+    if len(codes) % 2 != 0:
+        raise ValueError('Ciphertext of uneven length!')
+    digraphs = [a * 25 + b for a, b in zip(codes[::2], codes[1::2])]
+
+    tasks = [(scorer, alphabet, digraphs, horizontal, iterations,
+              temperature, schedule, seed + i) for i in range(restarts)]
+    found = dict((tuple(squares), fitness) for fitness, squares
+                 in _map(_squares_anneal, tasks, processes))
+    return [(tuple(util.Polybius(''.join(alphabet[c]
+                                         for c in squares[k:k + 25]),
+                                 alphabet) for k in (0, 25)), fitness)
+            for squares, fitness in found.items()]
+
+def _squares_anneal(args):
+    """
+    Anneals a pair of four-square or two-square keys from a random starting
+    point, returning the best fitness and pair of squares found.
+    """
+    (scorer, alphabet, digraphs, horizontal, iterations, temperature,
+     schedule, seed) = args
+    rng = random.Random(seed)
+    first, second = list(range(25)), list(range(25))
+    rng.shuffle(first)
+    rng.shuffle(second)
+    fitness, squares = _anneal(_squares_fitness(scorer, alphabet, digraphs,
+                                                horizontal),
+                               _squares_move, first + second, iterations,
+                               temperature, schedule, rng)
+    if horizontal is not None:
+        squares = _twosquare_canonical(squares, horizontal)
+    return fitness, squares
+
+def _squares_fitness(scorer, alphabet, digraphs, horizontal):
+    """
+    Returns a function that works out the trigram fitness of the decryption
+    of a digraph-coded four-square (if horizontal is None) or two-square
+    ciphertext under a pair of squares, held as one list of 50 letters by
+    position. The plaintext of each distinct digraph is kept from one call
+    to the next, and only worked out again for the letters that the changes
+    since the last pair of squares scored can affect.
+    """
+    size = len(scorer.alphabet)
+    letters = [scorer.alphabet.index(c) for c in alphabet]
+    distinct, pairs = _digraph_pairs(digraphs)
+    firsts, seconds = [d // 25 for d in distinct], [d % 25 for d in distinct]
+    # The distinct digraphs by their first and by their second letter.
+    by_first, by_second = [[] for _ in range(25)], [[] for _ in range(25)]
+    for i, (a, b) in enumerate(zip(firsts, seconds)):
+        by_first[a].append(i)
+        by_second[b].append(i)
+
+    bigrams = [0] * len(distinct)
+    where = [0] * 50
+    last = [None] * 50
+
+    def decrypt(squares, i):
+        (r1, c1), (r2, c2) = divmod(where[firsts[i]], 5), \
+                             divmod(where[seconds[i] + 25], 5)
+        if horizontal is None:
+            x, y = r1 * 5 + c2, r2 * 5 + c1
+        elif (r1 == r2) if horizontal else (c1 == c2):
+            x, y = where[firsts[i]], where[seconds[i] + 25]
+        elif horizontal:
+            x, y = r2 * 5 + c1, r1 * 5 + c2
+        else:
+            x, y = r1 * 5 + c2, r2 * 5 + c1
+        if horizontal is not None:
+            x, y = squares[x], squares[y + 25]
+        return letters[x] * size + letters[y]
+
+    def fitness(squares):
+        changed = [p for p in range(50) if squares[p] != last[p]]
+        for p in changed:
+            where[squares[p] + p // 25 * 25] = p % 25
+        last[:] = squares
+
+        if horizontal is None:
+            # Only the letters that have moved.
+            touched = [(squares[p], p // 25) for p in changed]
+        else:
+            # Every letter in a row (or column) with a change in it.
+            lines = set((p // 25, p % 25 % 5 if horizontal else p % 25 // 5)
+                        for p in changed)
+            touched = [(squares[k * 25 + (j * 5 + line if horizontal
+                                          else line * 5 + j)], k)
+                       for k, line in lines for j in range(5)]
+        for c, k in touched:
+            for i in (by_second if k else by_first)[c]:
+                bigrams[i] = decrypt(squares, i)
+        return _digraph_fitness(scorer, bigrams, pairs)
+    return fitness
+
+def _squares_move(squares, rng):
+    """
+    Returns a copy of a pair of squares, held as one list of 50 letters by
+    position, with a random change made to one of them.
+    """
+    k = rng.choice((0, 25))
+    return squares[:k] + _polybius_move(squares[k:k + 25], rng, 2, 5) + \
+           squares[k + 25:]
+
+def _twosquare_canonical(squares, horizontal):
+    """
+    Puts a pair of two-square keys, held as one list of 50 letters by
+    position, in a canonical order: the lines both squares share (columns,
+    or if they're arranged horizontally, rows) by the lowest letter in
+    the first square's, and each square's own lines by their lowest letter.
+    """
+    if horizontal:
+        # Turn the squares so that the shared lines are columns.
+        squares = [squares[k + c * 5 + r] for k in (0, 25)
+                   for r in range(5) for c in range(5)]
+    columns = sorted(range(5), key=lambda c: min(squares[c:25:5]))
+    squares = [squares[p - p % 5 + columns[p % 5]] for p in range(50)]
+    rows = [sorted(range(k, k + 25, 5), key=lambda r: min(squares[r:r + 5]))
+            for k in (0, 25)]
+    squares = [squares[rows[p // 25][p % 25 // 5] + p % 5]
+               for p in range(50)]
+    if horizontal:
+        squares = [squares[k + c * 5 + r] for k in (0, 25)
+                   for r in range(5) for c in range(5)]
+    return squares
+
+def break_bifid(ciphertext, period=None, max_period=20, candidates=3,
+                iterations=50000, temperature=20.0, restarts=4,
+                alphabet='abcdefghiklmnopqrstuvwxyz', scorer=None,
+                processes=None, seed=0, schedule=linear_schedule):
+    """
+    Breaks the Bifid cipher. Unless a period is given (0 for none), the
+    best few candidates up to max_period are picked with
+    analysis.fractionated_periods; for each, a number of random squares are
+    annealed as in break_playfair, swapping two letters or, now and then,
+    two rows or columns, and scoring the decryption by n-gram fitness (by
+    default, with English trigrams).
+    Decrypting needs no Polybius lookups: the square is a list of letters by
+    position, each ciphertext letter is split into the digits of its
+    position, and where each digit goes in the plaintext doesn't depend on
+    the key, so it's worked out once per period as a gather.
+    Restarts are spread over processes as in break_substitution.
+    Characters not in the alphabet are ignored.
+    Returns (fitness, Bifid) tuples for the distinct keys found.
+    """
+    return _break_fractionated(cipher.Bifid, 2, ciphertext, period,
+                               max_period, candidates, iterations,
+                               temperature, schedule, restarts, alphabet,
+                               scorer, processes, seed)
+
+def break_trifid(ciphertext, period=None, max_period=20, candidates=5,
+                 iterations=100000, temperature=20.0, restarts=4,
+                 alphabet='abcdefghijklmnopqrstuvwxyz.', scorer=None,
+                 processes=None, seed=0, schedule=linear_schedule):
+    """
+    Breaks the Trifid cipher, as break_bifid does the Bifid cipher, by
+    annealing a Polybius cube. Its periods are harder to spot, so more of
+    them are tried by default, and it takes far longer texts to break.
+    Returns (fitness, Trifid) tuples for the distinct keys found.
+    """
+    return _break_fractionated(cipher.Trifid, 3, ciphertext, period,
+                               max_period, candidates, iterations,
+                               temperature, schedule, restarts, alphabet,
+                               scorer, processes, seed)
+
+def _break_fractionated(cls, dimensions, ciphertext, period, max_period,
+                        candidates, iterations, temperature, schedule,
+                        restarts, alphabet, scorer, processes, seed):
+    """
+    Does the work of break_bifid and break_trifid.
+    """
+    scorer = _scorer_for(scorer)
+    side = int(round(len(alphabet) ** (1.0 / dimensions)))
+    if side ** dimensions != len(alphabet):
+        raise ValueError("Can't map alphabet onto a square!")
+    codes = analysis.encode(ciphertext.lower(), alphabet, strip=True)
+    if period is not None:
+        periods = [max(int(period), 0)]
+    else:
+        scores = analysis.fractionated_periods(codes, max_period, dimensions,
+                                               alphabet)
+        periods = sorted(scores, key=scores.get, reverse=True)[:candidates]
+
+    letters = [scorer.alphabet.index(c) if c in scorer.alphabet
+               else len(scorer.alphabet) for c in alphabet]
+    tasks = [(scorer, letters, codes, p, dimensions, side, iterations,
+              temperature, schedule, seed + i * len(periods) + j)
+             for i in range(restarts) for j, p in enumerate(periods)]
+    found = dict(((tuple(square), p), fitness) for fitness, square, p
+                 in _map(_fractionated_anneal, tasks, processes))
+    return _ranked([(fitness, cls(''.join(alphabet[c] for c in square), p))
+                    for (square, p), fitness in found.items()], True)
+
+def _fractionated_anneal(args):
+    """
+    Anneals a Polybius square or cube for a given period from a random
+    starting point, returning the best fitness and key found, and the period.
+    """
+    (scorer, letters, codes, period, dimensions, side, iterations,
+     temperature, schedule, seed) = args
+    rng = random.Random(seed)
+    square = list(range(side ** dimensions))
+    rng.shuffle(square)
+    fitness = _fractionated_fitness(scorer, letters, codes, period, dimensions,
+                                    side)
+    move = functools.partial(_polybius_move, dimensions=dimensions, side=side)
+    fitness, square = _anneal(fitness, move, square, iterations, temperature,
+                              schedule, rng)
+    return fitness, square, period
+
+def _fractionated_fitness(scorer, letters, codes, period, dimensions, side):
+    """
+    Returns a function that works out the n-gram fitness of the decryption
+    of an encoded Bifid or Trifid ciphertext with a given period under a
+    Polybius square or cube, held as a list of letters by position.
+    """
+    # The digits of each position, most significant (the layer or row) first.
+    digits = [tuple(p // side ** (dimensions - k - 1) % side
+                    for k in range(dimensions))
+              for p in range(side ** dimensions)]
+    # Where the kth digit of each plaintext letter is in the stream of the
+    # ciphertext letters' digits.
+    n, step = len(codes), period or max(len(codes), 1)
+    gathers = []
+    for k in range(dimensions):
+        where = [dimensions * start + k * min(step, n - start) + j - start
+                 for start in range(0, n, step)
+                 for j in range(start, min(start + step, n))]
+        gathers.append(_gather(where))
+    times = [x * side for x in range(side ** dimensions)]
+    # The n-grams a letter outside the scorer's alphabet breaks up would
+    # otherwise go unscored, which would make it look better than any.
+    outside, penalty = len(scorer.alphabet), scorer.ngram * scorer.floor
+    chain = itertools.chain.from_iterable
+
+    def fitness(square):
+        coordinates = [None] * len(square)
+        for p, c in enumerate(square):
+            coordinates[c] = digits[p]
+        stream = list(chain(map(coordinates.__getitem__, codes)))
+        index = gathers[0](stream)
+        for gather in gathers[1:]:
+            index = map(operator.add, map(times.__getitem__, index),
+                        gather(stream))
+        plain = [letters[c] for c in square]
+        decrypted = array.array('B', map(plain.__getitem__, index))
+        return scorer.score(decrypted) + penalty * decrypted.count(outside)
+    return fitness
+
+def _gather(positions):
+    """
+    Returns a function that picks the items at the given positions out of a
+    sequence, as a list.
+    """
+    if len(positions) == 1:
+        return lambda sequence: [sequence[positions[0]]]
+    if not positions:
+        return lambda sequence: []
+    return operator.itemgetter(*positions)
+
+def _polybius_move(square, rng, dimensions, side):
+    """
+    Returns a copy of a Polybius square or cube, held as a list of letters
+    by position, with two letters or (now and then) two slices along one
+    axis swapped.
+    """
+    square = square[:]
+    if rng.random() < 0.9:
+        a, b = rng.sample(range(len(square)), 2)
+        square[a], square[b] = square[b], square[a]
+        return square
+    axis = side ** rng.randrange(dimensions)
+    a, b = rng.sample(range(side), 2)
+    for p in range(len(square)):
+        if p // axis % side == a:
+            q = p + (b - a) * axis
+            square[p], square[q] = square[q], square[p]
+    return square
+
+def break_fractionatedmorse(ciphertext, restarts=10, kicks=30, scorer=None,
+                            processes=None, seed=0):
+    """
+    Breaks the fractionated Morse cipher by hill-climbing over the keyed
+    alphabet, held as a list of ciphertext letters by trigraph, from a number
+    of random keys. Pairs of letters are swapped whenever that makes the
+    decryption better, until no swap does, and the key is then kicked as in
+    break_substitution.
+    Decrypting a key takes a handful of passes over the text, none of them
+    in a Python loop: its letters are gathered into their trigraphs, joined
+    into one Morse stream, split into codes, and the codes mapped to
+    plaintext characters. Codes that aren't valid Morse (or runs of spaces,
+    which encryption collapses) are counted first, and a key with more of
+    them than the one it's up against is thrown out without being scored.
+    The rest are scored with an NgramScorer (by default, with English
+    trigrams) with the words run together, less a penalty of ngram unseen
+    n-grams for each character outside the scorer's alphabet, such as a
+    digit, and for each invalid code.
+    Restarts are spread over processes as in break_substitution. The
+    ciphertext is lowercased, and characters other than letters ignored.
+    Returns (fitness, FractionatedMorse) tuples for the distinct keys found,
+    ranked by how many invalid codes their decryptions have, fewest first,
+    and then by fitness, best first. Keys with any invalid codes can't
+    decrypt the ciphertext themselves, but are still the best attempts.
+    """
+    scorer = _scorer_for(scorer)
+    letters = string.ascii_lowercase
+    codes = analysis.encode(ciphertext.lower(), letters, strip=True)
+    tasks = [(scorer, codes, kicks, seed + i) for i in range(restarts)]
+    found = dict((tuple(key), (invalid, -fitness)) for invalid, fitness, key
+                 in _map(_morse_search, tasks, processes))
+    return [(-rank[1], cipher.FractionatedMorse(''.join(letters[c]
+                                                        for c in key)))
+            for key, rank in sorted(found.items(),
+                                    key=operator.itemgetter(1))]
+
+# The Morse trigraphs, in the order keyed alphabets are laid over them: all
+# but XXX.
+_TRIGRAPHS = [''.join(t).encode('ascii')
+              for t in itertools.product('.-X', repeat=3)][:26]
+
+def _morse_search(args):
+    """
+    Searches for a fractionated Morse key from a random starting point,
+    returning how many invalid codes its decryption has, its fitness and the
+    key it ends up at.
+    """
+    scorer, codes, kicks, seed = args
+    rng = random.Random(seed)
+    fitness = _morse_fitness(scorer, codes)
+    pairs = list(itertools.combinations(range(len(_TRIGRAPHS)), 2))
+    key = list(range(len(_TRIGRAPHS)))
+    rng.shuffle(key)
+    key, best = _morse_climb(fitness, key, pairs, rng)
+    for _ in range(kicks):
+        trial = key[:]
+        for a, b in rng.sample(pairs, _KICK):
+            trial[a], trial[b] = trial[b], trial[a]
+        trial, result = _morse_climb(fitness, trial, pairs, rng)
+        if result[1] > best[1] + _EPSILON:
+            key, best = trial, result
+    return best[0], best[1], key
+
+def _morse_climb(fitness, key, pairs, rng):
+    """
+    Swaps pairs of letters in a fractionated Morse key, in random order,
+    whenever that improves the fitness of its decryption, until none does.
+    Returns the key, and how many invalid codes its decryption has and its
+    fitness.
+    """
+    current = fitness(key)
+    improved = True
+    while improved:
+        improved = False
+        rng.shuffle(pairs)
+        for a, b in pairs:
+            key[a], key[b] = key[b], key[a]
+            trial = fitness(key, current[0])
+            if trial[1] is not None and trial[1] > current[1] + _EPSILON:
+                current, improved = trial, True
+            else:
+                key[a], key[b] = key[b], key[a]
+    return key, current
+
+def _morse_fitness(scorer, codes):
+    """
+    Returns a function that decrypts an encoded fractionated Morse
+    ciphertext under a key and returns how many invalid codes the decryption
+    has and, unless that's more than an optional bound, its fitness.
+    """
+    # Plaintext characters by Morse code: letters the scorer knows as their
+    # codes, spaces as one past those and anything else as two past.
+    size = len(scorer.alphabet)
+    plain = {}
+    for c, code in cipher.FractionatedMorse.morse.items():
+        if c in scorer.alphabet:
+            plain[code.encode('ascii')] = scorer.alphabet.index(c)
+        else:
+            plain[code.encode('ascii')] = size if c == ' ' else size + 1
+    invalid, space, other = (bytes(bytearray([c]))
+                             for c in (size + 2, size, size + 1))
+    # NgramScorer skips n-grams with anything past the alphabet, as long as
+    # it's just past.
+    outside = list(range(256))
+    outside[size + 1] = size
+    outside = bytes(bytearray(outside))
+    penalty = scorer.ngram * scorer.floor
+    morse = _TRIGRAPHS
+
+    def fitness(key, bound=None):
+        where = [0] * len(key)
+        for t, c in enumerate(key):
+            where[c] = t
+        stream = b''.join(map(morse.__getitem__,
+                              map(where.__getitem__, codes)))
+        morses = stream.split(b'X')
+        decrypted = bytes(bytearray(map(plain.get, morses, itertools.repeat(
+            size + 2, len(morses)))))
+        count = decrypted.count(invalid) + stream.count(b'XXX')
+        if bound is not None and count > bound:
+            return count, None
+        decrypted = decrypted.translate(None, invalid + space)
+        penalties = penalty * (count + decrypted.count(other))
+        decrypted = array.array('B', decrypted.translate(outside))
+        return count, scorer.score(decrypted) + penalties
+    return fitness
+
+def break_bazeries(ciphertext, max_key=10 ** 6, min_key=1, top=10,
+                   alphabet='abcdefghiklmnopqrstuvwxyz',
+                   numberword=util.numberword, scorer=None, processes=None):
+    """
+    Breaks the Bazeries cipher by trying every key from min_key to max_key.
+    The keys are split into shards of _SHARD, which are swept across a pool
+    of processes. Many keys spell out the same letters once duplicates are
+    dropped, so each shard builds the substitution for each distinct key
+    string only once, as a bytes.translate table; the transposition is done
+    with slices. Each candidate is scored with an NgramScorer (by default,
+    with English trigrams) on the first _SWEEP characters, and each shard
+    keeps the top ones in a heap. The best of all the shards are then scored
+    on the whole text.
+    Characters not in the alphabet are ignored.
+    Returns the top (fitness, Bazeries) tuples, best first.
+    """
+    scorer = _scorer_for(scorer)
+    if not set(alphabet) <= set(scorer.alphabet):
+        raise ValueError("Scorer's alphabet doesn't cover the cipher's!")
+    if min_key < 1:
+        raise ValueError('Keys must be positive!')
+    plain = cipher.Bazeries(min_key, alphabet, numberword).plain.contents
+    letters = [scorer.alphabet.index(c) for c in plain]
+    text = ''.join(c for c in ciphertext.lower() if c in alphabet)
+
+    # A segment is at most nine characters long, so the one the sample ends
+    # in can't reach further than this.
+    sample = bytes(bytearray(analysis.encode(text[:_SWEEP + 8], alphabet)))
+    tasks = [(sample, start, min(start + _SHARD, max_key + 1), top, alphabet,
+              numberword, letters, scorer)
+             for start in range(min_key, max_key + 1, _SHARD)]
+    best = heapq.nlargest(top, itertools.chain(*_map(_bazeries_sweep, tasks,
+                                                     processes)))
+    results = []
+    for _, key in best:
+        bazeries = cipher.Bazeries(key, alphabet, numberword)
+        results.append((scorer.score(bazeries.decrypt(text)), bazeries))
+    return _ranked(results, True)
+
+def _bazeries_sweep(args):
+    """
+    Tries a range of Bazeries keys on the start of a ciphertext, encoded as
+    bytes, returning the top ones as (fitness, key) tuples.
+    """
+    sample, start, stop, top, alphabet, numberword, letters, scorer = args
+    length = min(len(sample), _SWEEP)
+    padding = [0] * (256 - len(alphabet))
+
+    # With a byte in front, segment [i, i + d) reversed is [i + d, i) in
+    # steps of -1, which saves a slice.
+    sample = b'\0' + sample
+    tables, best = {}, []
+    for key in range(start, stop):
+        distinct = ''.join(collections.OrderedDict.fromkeys(numberword(key)))
+        table = tables.get(distinct)
+        if table is None:
+            # Each ciphertext letter decrypts to the plaintext square's letter
+            # in the same position as it has in the key's square, which is
+            # filled as util.Polybius fills it.
+            if not all(c in alphabet for c in distinct):
+                raise ValueError('Invalid key!')
+            contents = distinct + ''.join(c for c in alphabet
+                                          if c not in distinct)
+            table = tables[distinct] = bytes(bytearray(
+                [letters[contents.index(c)] for c in alphabet] + padding))
+
+        digits = [int(d) for d in str(key)]
+        pieces, i = [], 0
+        while i < length:
+            for d in digits:
+                pieces.append(sample[i + d:i:-1])
+                i += d
+        fitness = _dense_fitness(scorer, b''.join(pieces)[:length]
+                                 .translate(table))
+        if len(best) < top:
+            heapq.heappush(best, (fitness, key))
+        elif fitness > best[0][0]:
+            heapq.heapreplace(best, (fitness, key))
+    return best
+
+def _dense_fitness(scorer, codes):
+    """
+    Scores an encoded text as NgramScorer.score does, given bytes or any
+    other iterable of codes (the Ragbaby solver passes an iterator) with
+    nothing outside the scorer's alphabet in it, which saves checking.
+    """
+    codes = bytearray(codes)
+    shift = functools.partial(operator.mul, len(scorer.alphabet))
+    # Slice everything to the number of n-grams, since Python 2's map pads
+    # shorter sequences with None rather than stopping.
+    grams = max(len(codes) - scorer.ngram + 1, 0)
+    indices = codes[:grams]
+    for k in range(1, scorer.ngram):
+        indices = map(operator.add, map(shift, indices), codes[k:k + grams])
+    return sum(map(scorer.table.__getitem__, indices))
+
+def break_ragbaby(ciphertext, iterations=100000, temperature=20.0, restarts=4,
+                  alphabet=string.ascii_lowercase, scorer=None, processes=None,
+                  seed=0, schedule=linear_schedule):
+    """
+    Breaks the Ragbaby cipher by simulated annealing, as break_playfair does,
+    over the keyed alphabet, held as a list of letters by position. Most
+    moves swap two letters; the rest move one elsewhere. Word boundaries
+    survive encryption, so how far back each ciphertext letter is shifted is
+    known from the start, and worked out once. Each candidate then decrypts
+    with two gathers: from letters to their positions in the keyed alphabet
+    and, offset by those shifts, back to letters. The decryption is scored
+    with an NgramScorer (by default, with English trigrams) with its words
+    run together, as they're mostly too short to score on their own.
+    The keyed alphabet is only fixed up to rotation, so the keys found are
+    rotated to start with the first letter of the alphabet.
+    Restarts are spread over processes as in break_substitution.
+    Returns (fitness, Ragbaby) tuples for the distinct keys found.
+    """
+    scorer = _scorer_for(scorer)
+    if not all(c in scorer.alphabet for c in alphabet):
+        raise ValueError("Scorer's alphabet doesn't match!")
+    letters = [scorer.alphabet.index(c) for c in alphabet]
+
+    # Each letter is shifted by its position in its word.
+    size, n = len(alphabet), 0
+    codes, offsets = [], []
+    for c in ciphertext.lower():
+        if c in alphabet:
+            n += 1
+            codes.append(alphabet.index(c))
+            offsets.append(-n % size)
+        else:
+            n = 0
+    if size < 2:
+        return [(_dense_fitness(scorer, [letters[0]] * len(codes)),
+                 cipher.Ragbaby('', alphabet))] if size else []
+
+    tasks = [(scorer, letters, codes, offsets, iterations, temperature,
+              schedule, seed + i) for i in range(restarts)]
+    found = dict((tuple(key), fitness) for fitness, key
+                 in _map(_ragbaby_anneal, tasks, processes))
+    return _ranked([(fitness, cipher.Ragbaby(''.join(alphabet[c] for c in key),
+                                             alphabet))
+                    for key, fitness in found.items()], True)
+
+def _ragbaby_anneal(args):
+    """
+    Anneals a Ragbaby keyed alphabet from a random starting point, returning
+    the best fitness and (rotated) key found.
+    """
+    (scorer, letters, codes, offsets, iterations, temperature, schedule,
+     seed) = args
+    rng = random.Random(seed)
+    key = list(range(len(letters)))
+    rng.shuffle(key)
+    fitness, key = _anneal(_ragbaby_fitness(scorer, letters, codes, offsets),
+                           _ragbaby_move, key, iterations, temperature,
+                           schedule, rng)
+    start = key.index(0)
+    return fitness, key[start:] + key[:start]
+
+def _ragbaby_fitness(scorer, letters, codes, offsets):
+    """
+    Returns a function that works out the n-gram fitness of the decryption
+    of an encoded Ragbaby ciphertext under a keyed alphabet, given how far
+    back each letter is shifted.
+    """
+    def fitness(key):
+        where = [0] * len(key)
+        for p, c in enumerate(key):
+            where[c] = p
+        # Twice round, so positions less shifts needn't wrap.
+        plain = [letters[c] for c in key] * 2
+        return _dense_fitness(scorer, map(plain.__getitem__,
+                                          map(operator.add,
+                                              map(where.__getitem__, codes),
+                                              offsets)))
+    return fitness
+
+def _ragbaby_move(key, rng):
+    """
+    Returns a copy of a Ragbaby keyed alphabet with two letters swapped or
+    (now and then) one moved elsewhere.
+    """
+    key = key[:]
+    a, b = rng.sample(range(len(key)), 2)
+    if rng.random() < 0.9:
+        key[a], key[b] = key[b], key[a]
+    else:
+        key.insert(b, key.pop(a))
+    return key
+
+def break_homophonic(ciphertext, alphabet=None, iterations=100000,
+                     temperature=10.0, restarts=10, weight=3.0,
+                     freqs=english.unigram, scorer=None, processes=None,
+                     seed=0, schedule=linear_schedule):
+    """
+    Breaks homophonic substitution ciphers, such as Homophonic with a
+    RandomDict, where each ciphertext character stands for one plaintext
+    letter, but a letter can have any number of them. Each restart draws a
+    letter for every character according to a unigram table, then anneals
+    as break_playfair does, each move making one character decrypt to
+    another letter, scored by the n-gram fitness of the decryption (by
+    default, with English trigrams).
+    N-gram fitness alone likes nothing better than decrypting most
+    characters to the same few letters, so it's held in check by weight
+    times the log-likelihood ratio of the letter counts against the unigram
+    table. Each character is counted once, and the letters' counts are kept
+    up to date from those as characters move.
+    The ciphertext's distinct n-grams are counted once, and the index of
+    each one's decryption is kept up to date as characters move: a move
+    adds the same multiple of a fixed weight to the index of every n-gram
+    the character is in, so scoring it is a handful of gathers.
+    With 50 to 100 characters, about a thousand letters are enough for
+    around half of restarts to find most of the key, though even the
+    fittest may get rare characters wrong.
+    alphabet is the ciphertext alphabet, by default every character in the
+    ciphertext except whitespace; other characters are ignored. Case
+    matters, since homophonic ciphers often use both cases to get enough
+    characters.
+    Returns (fitness, Homophonic) tuples for the distinct keys found.
+    """
+    scorer = _scorer_for(scorer)
+    if alphabet is None:
+        alphabet = ''.join(sorted(set(ciphertext) - set(string.whitespace)))
+    tasks = [(scorer, ciphertext, alphabet, iterations, temperature, schedule,
+              weight, freqs, seed + i) for i in range(restarts)]
+    found = dict((tuple(sorted(key.items())), fitness) for fitness, key
+                 in _map(_homophonic_anneal, tasks, processes))
+    results = []
+    for key, fitness in found.items():
+        symbols = collections.defaultdict(list)
+        for c, p in key:
+            symbols[p].append(c)
+        results.append((fitness, cipher.Homophonic(util.RandomDict(symbols))))
+    return _ranked(results, True)
+
+def _homophonic_anneal(args):
+    """
+    Anneals a homophonic substitution key from a random starting point,
+    returning the fitness and the key (mapping ciphertext to plaintext) of
+    the best one found.
+    """
+    (scorer, ciphertext, alphabet, iterations, temperature, schedule, weight,
+     freqs, seed) = args
+    rng = random.Random(seed)
+    n, size, table = scorer.ngram, len(scorer.alphabet), scorer.table
+
+    # Draw a letter for each character according to the unigram table.
+    letters, bounds, total = [], [], 0.0
+    for i, p in enumerate(scorer.alphabet):
+        if freqs.get(p, 0) > 0:
+            total += freqs[p]
+            letters.append(i)
+            bounds.append(total)
+    key = [letters[bisect.bisect(bounds, rng.random() * total)]
+           for c in alphabet]
+
+    # For each distinct n-gram, keep the index of its decryption, and for
+    # each character, the n-grams it's in, how often they occur, and what
+    # moving the character by one letter adds to their indices.
+    codes = analysis.encode(ciphertext, alphabet)
+    distinct, indices = [], []
+    grams = [[] for c in alphabet]
+    counts = [[] for c in alphabet]
+    steps = [[] for c in alphabet]
+    lookup = dict((c, i) for i, c in enumerate(alphabet))
+    for gram, count in analysis.ngram_counts(codes, n, alphabet).items():
+        chars, index = [lookup[c] for c in reversed(gram)], 0
+        for k, c in enumerate(chars):
+            index += key[c] * size ** k
+        step = collections.defaultdict(int)
+        for k, c in enumerate(chars):
+            step[c] += size ** k
+        for c, value in step.items():
+            grams[c].append(len(indices))
+            counts[c].append(count)
+            steps[c].append(value)
+        distinct.append((chars, count))
+        indices.append(index)
+
+    # Count each character once, and each letter as the sum of its
+    # characters' counts.
+    occurs = analysis.ngram_counts(codes, 1, alphabet, dense=True)
+    expected = [0.0] * size
+    for i in letters:
+        expected[i] = sum(occurs) * freqs[scorer.alphabet[i]] / total
+    totals = [0] * size
+    for c, p in enumerate(key):
+        totals[p] += occurs[c]
+
+    def fit(p, m):
+        # The letter's part of the log-likelihood ratio of the counts.
+        return -m * math.log(m / expected[p]) if m else 0.0
+
+    def fitness(key):
+        return sum(count * table[sum(key[c] * size ** k
+                                     for k, c in enumerate(chars))]
+                   for chars, count in distinct)
+
+    def gain(c, p):
+        # The change in n-gram fitness from making c decrypt to p.
+        old = list(map(indices.__getitem__, grams[c]))
+        new = map(operator.add, old,
+                  map(operator.mul, steps[c],
+                      itertools.repeat(p - key[c], len(steps[c]))))
+        return sum(map(operator.mul, counts[c],
+                       map(operator.sub, map(table.__getitem__, new),
+                           map(table.__getitem__, old))))
+
+    def move(c, p):
+        q = key[c]
+        key[c] = p
+        for g, step in zip(grams[c], steps[c]):
+            indices[g] += (p - q) * step
+        totals[q] -= occurs[c]
+        totals[p] += occurs[c]
+
+    score = fitness(key) + weight * sum(fit(p, totals[p]) for p in letters)
+    best = score, key[:]
+    for i in range(iterations if alphabet else 0):
+        t = schedule(i, iterations, temperature)
+        c, p = rng.randrange(len(alphabet)), rng.choice(letters)
+        q, m = key[c], occurs[c]
+        if p == q:
+            continue
+        delta = gain(c, p) + weight * (
+            fit(q, totals[q] - m) - fit(q, totals[q]) +
+            fit(p, totals[p] + m) - fit(p, totals[p]))
+        if delta >= 0 or t > 0 and rng.random() < math.exp(delta / t):
+            move(c, p)
+            score += delta
+            if score > best[0]:
+                best = score, key[:]
+    # Work the fitness out afresh rather than from all those deltas.
+    return fitness(best[1]), dict((c, scorer.alphabet[p])
+                                  for c, p in zip(alphabet, best[1]))
+
+def break_substitution(ciphertext, restarts=10, kicks=10, alphabet=None,
+                       scorer=None, processes=None, seed=0):
+    """
+    Breaks general monoalphabetic substitution ciphers, including Simple,
+    Keyword and KamaSutra, by hill-climbing from a number of random keys.
+    Plaintext letters are swapped whenever that improves the n-gram fitness
+    of the decryption (by default, with English trigrams), as tracked by
+    analysis.SubstitutionScorer without decrypting anything, until no swap
+    does. The key is then kicked with a few random swaps and climbed again
+    a number of times, going back whenever that doesn't pay off.
+    Restarts are spread over a pool of processes (by default, one per CPU;
+    with 1, none is started) and each is seeded with seed plus its number,
+    so results don't depend on how they're spread.
+    alphabet is the ciphertext alphabet, by default the same as the scorer's;
+    other characters are ignored, and the ciphertext is lowercased.
+    Returns (fitness, Simple) tuples for the distinct keys found.
+    """
+    scorer = _scorer_for(scorer)
+    alphabet = alphabet if alphabet is not None else scorer.alphabet
+    if len(alphabet) > len(scorer.alphabet):
+        raise ValueError('Ciphertext alphabet is bigger than the plaintext '
+                         'one!')
+    tasks = [(scorer, ciphertext.lower(), alphabet, kicks, seed + i)
+             for i in range(restarts)]
+    found = dict((tuple(sorted(key.items())), fitness) for fitness, key
+                 in _map(_substitution_search, tasks, processes))
+    return _ranked([(fitness, cipher.Simple(dict((p, c) for c, p in key)))
+                    for key, fitness in found.items()], True)
+
+def _substitution_search(args):
+    """
+    Searches for a substitution key from a random starting point, returning
+    the fitness and the key (mapping ciphertext to plaintext) it ends up at.
+    """
+    scorer, ciphertext, alphabet, kicks, seed = args
+    rng = random.Random(seed)
+    key = dict(zip(alphabet, rng.sample(scorer.alphabet, len(alphabet))))
+    subst = analysis.SubstitutionScorer(scorer, ciphertext, key, alphabet)
+    pairs = list(itertools.combinations(scorer.alphabet, 2))
+    _swap_climb(subst, pairs, rng, [])
+    for _ in range(kicks):
+        fitness, swaps = subst.fitness, []
+        for a, b in rng.sample(pairs, _KICK):
+            delta = subst.delta(a, b)
+            subst.swap(a, b, delta)
+            swaps.append((a, b, delta))
+        _swap_climb(subst, pairs, rng, swaps)
+        if subst.fitness <= fitness + _EPSILON:
+            for a, b, delta in reversed(swaps):
+                subst.swap(a, b, -delta)
+            subst.fitness = fitness
+    return subst.fitness, subst.key
+
+def _swap_climb(subst, pairs, rng, swaps):
+    """
+    Swaps pairs of plaintext letters in a SubstitutionScorer, in random order,
+    whenever that improves the fitness, until none does. The swaps made are
+    appended to a list so they can be undone.
+    """
+    improved = True
+    while improved:
+        improved = False
+        rng.shuffle(pairs)
+        for a, b in pairs:
+            delta = subst.delta(a, b)
+            if delta > _EPSILON:
+                subst.swap(a, b, delta)
+                swaps.append((a, b, delta))
+                improved = True
+
+def _map(function, tasks, processes=None):
+    """
+    Maps a function over a list of tasks, across a pool of processes unless
+    processes is 1.
+    """
+    if processes == 1 or len(tasks) < 2:
+        return [function(task) for task in tasks]
+    pool = multiprocessing.Pool(processes)
+    try:
+        return pool.map(function, tasks)
+    finally:
+        pool.close()
+        pool.join()
+
+def break_vigenere(ciphertext, max_period=20, alphabet=string.ascii_lowercase,
+                   freqs=english.unigram, scorer=None, candidates=5):
+    """
+    Breaks the Vigenere cipher. Key lengths up to max_period are ranked by
+    the average IC of the columns they split the ciphertext into; for each of
+    the best few candidates, each key letter is found by scoring every shift
+    of its column's counts with chi2 against a unigram table, as in
+    break_caesar. Each key is then refined by trying every other shift one
+    column at a time, keeping those that improve n-gram fitness (by default,
+    with English trigrams) on at most the first _SAMPLE characters.
+    The ciphertext is lowercased, and characters not in the alphabet are
+    ignored; like Vigenere itself, the keys found expect text without them.
+    Returns (fitness, Vigenere) tuples for the distinct keys found.
+    """
+    scorer = _scorer_for(scorer, alphabet)
+    size = len(alphabet)
+    codes = analysis.encode(ciphertext.lower(), alphabet, strip=True)
+
+    ics = analysis.periodic_ic(codes, min(max_period, len(codes) // _COLUMN),
+                               alphabet)
+    ics = sorted(((ic, period) for period, ic in ics.items()), reverse=True)
+
+    chi2 = analysis.Chi2Scorer(freqs, alphabet)
+    tables, results = _shift_tables(size), {}
+    for _, period in ics[:candidates]:
+        key = []
+        for j in range(period):
+            counts = analysis.ngram_counts(codes[j::period], 1, alphabet,
+                                           dense=True)
+            scores = [chi2.score_counts(rotated)
+                      for rotated in _rotations(counts)]
+            key.append(scores.index(min(scores)))
+        key = _shortest_period(_climb(scorer, codes[:_SAMPLE], key, tables)[1])
+        results[''.join(alphabet[k] for k in key)] = \
+            scorer.score(_unshifted(codes, key, tables))
+    return _ranked([(fitness, cipher.Vigenere(key, alphabet))
+                    for key, fitness in results.items()], True)
+
+def break_autokey(ciphertext, max_primer=20, alphabet=string.ascii_lowercase,
+                  freqs=english.unigram, scorer=None, candidates=5):
+    """
+    Breaks the autokey cipher. For a given primer length, taking each
+    ciphertext character less the one a primer length before it, and so on
+    back to the start, cancels out the plaintext feedback: what's left is
+    the plaintext encrypted with the Vigenere cipher, with the primer followed
+    by its negation as the key. Primer lengths are ranked by the IC of the
+    columns of that text, and for the best few, each primer letter is found
+    by scoring all its values at once with chi2 from its residue class's
+    counts. The primers are then refined with n-gram fitness, as in
+    break_vigenere.
+    The ciphertext is lowercased, and characters not in the alphabet are
+    ignored.
+    Returns (fitness, Autokey) tuples, best first.
+    """
+    scorer = _scorer_for(scorer, alphabet)
+    size = len(alphabet)
+    codes = analysis.encode(ciphertext.lower(), alphabet, strip=True)
+    tables = _shift_tables(size)
+
+    def expand(primer):
+        return primer + [-k % size for k in primer]
+
+    # Rank the lengths by the IC of the columns of what's left once the
+    # feedback is cancelled out, as for the Vigenere cipher.
+    found = []
+    for length in range(1, min(max_primer, len(codes) // _COLUMN) + 1):
+        residues = _unfed(codes, length, size)
+        ics = analysis.periodic_ic(residues, 2 * length, alphabet, 2 * length)
+        found.append((ics.get(2 * length, 0.0), length, residues))
+    found.sort(key=operator.itemgetter(0), reverse=True)
+
+    chi2 = analysis.Chi2Scorer(freqs, alphabet)
+    results = []
+    for _, length, residues in found[:candidates]:
+        columns = [analysis.ngram_counts(residues[j::2 * length], 1, alphabet,
+                                         dense=True)
+                   for j in range(2 * length)]
+        primer = []
+        for even, odd in zip(columns[:length], columns[length:]):
+            # Even and odd multiples of the length are shifted back and
+            # forward by the primer letter respectively, so undoing shift k
+            # takes letter x from even[x + k] and odd[x - k].
+            observed = [[even[(x + k) % size] + odd[(x - k) % size]
+                         for x in range(size)] for k in range(size)]
+            scores = [chi2.score_counts(counts) for counts in observed]
+            primer.append(scores.index(min(scores)))
+        primer = _climb(scorer, residues[:_SAMPLE], primer, tables, expand)[1]
+        fitness = scorer.score(_unshifted(residues, expand(primer), tables))
+        primer = ''.join(alphabet[k] for k in primer)
+        results.append((fitness, cipher.Autokey(primer, alphabet)))
+    return _ranked(results, True)
+
+def _unfed(codes, length, size):
+    """
+    Subtracts from each character of an encoded autokey ciphertext the
+    previous result a primer length before it, leaving a text that decrypts
+    like a Vigenere ciphertext.
+    """
+    residues = list(codes)
+    for i in range(length, len(residues)):
+        residues[i] = (residues[i] - residues[i - length]) % size
+    return array.array(codes.typecode, residues)
+
+def _shift_tables(size):
+    """
+    Makes a table for each key letter mapping encoded characters to the
+    characters they are shifted back to, as bytes.translate tables if the
+    alphabet is small enough for the text to be encoded as bytes.
+    """
+    tables = [[(c - k) % size for c in range(size)] for k in range(size)]
+    if size < 256:
+        tables = [bytes(bytearray(table + list(range(size, 256))))
+                  for table in tables]
+    return tables
+
+def _unshifted(codes, key, tables):
+    """
+    Shifts each character of an encoded text back by the key letter for its
+    position, as Vigenere decryption does, using tables from _shift_tables.
+    """
+    period = len(key)
+    if codes.typecode == 'B':
+        plain = bytearray(codes)
+        for j, k in enumerate(key):
+            plain[j::period] = plain[j::period].translate(tables[k])
+        return array.array('B', bytes(plain))
+    return array.array(codes.typecode, [tables[key[i % period]][c]
+                                        for i, c in enumerate(codes)])
+
+def _climb(scorer, sample, key, tables, expand=list):
+    """
+    Hill-climbs a list of shifts one position at a time, trying every shift
+    in each, until the fitness of the sample shifted back (as _unshifted) by
+    expand(key) stops improving. Returns the fitness and the key.
+    """
+    fitness = scorer.score(_unshifted(sample, expand(key), tables))
+    improved = True
+    while improved:
+        improved = False
+        for j in range(len(key)):
+            for shift in range(len(tables)):
+                trial = key[:j] + [shift] + key[j + 1:]
+                score = scorer.score(_unshifted(sample, expand(trial), tables))
+                if score > fitness:
+                    key, fitness, improved = trial, score, True
+    return fitness, key
+
+def _shortest_period(key):
+    """
+    Returns the shortest list that repeats to make the given key.
+    """
+    for period in range(1, len(key)):
+        if len(key) % period == 0 and key == key[:period] * (len(key) // period):
+            return key[:period]
+    return key
+
+def break_column(ciphertext, max_width=20, exhaustive=8, restarts=10,
+                 kicks=50, scorer=None, processes=None, seed=0):
+    """
+    Breaks the columnar transposition cipher. Each key width up to max_width
+    that divides the length of the ciphertext, and leaves columns long enough
+    to go on, is searched for the order of its columns: every order if the
+    width is at most exhaustive, otherwise by hill-climbing from a number of
+    random orders, swapping two columns or sliding one along, then kicking
+    the order with a few random swaps and climbing again, as in
+    break_substitution.
+    An order is scored by the bigram fitness of the decryption (by default,
+    with English bigrams), which is made up of what each pair of adjacent
+    columns contributes, plus the bigrams running from the end of each row
+    onto the next. Those are worked out once for every pair of columns, so
+    trying an order costs a lookup per column, and a move only means looking
+    up the links it changes again.
+    Widths are spread over processes as restarts are in break_substitution.
+    Returns (fitness, Column) tuples for the best order of each width.
+    """
+    if max_width > len(string.ascii_lowercase):
+        raise ValueError('Key widths can be at most 26!')
+    if scorer is None:
+        scorer = analysis.NgramScorer(english.bigram)
+    if scorer.ngram != 2:
+        raise ValueError('Scorer must use bigrams!')
+    codes = analysis.encode(ciphertext.lower(), scorer.alphabet)
+
+    widths = [width for width in range(2, min(max_width,
+                                              len(codes) // _COLUMN) + 1)
+              if len(codes) % width == 0]
+    tasks = [(scorer, codes, width, exhaustive, restarts, kicks, seed + i)
+             for i, width in enumerate(widths)]
+    return _ranked([(fitness, cipher.Column(''.join(string.ascii_lowercase[c]
+                                                    for c in order)))
+                    for fitness, order in _map(_column_search, tasks,
+                                               processes)], True)
+
+def _column_search(args):
+    """
+    Finds the best order of the columns of a ciphertext of a given width,
+    returning its fitness and, for each plaintext column, the number of the
+    ciphertext column that goes there.
+    """
+    scorer, codes, width, exhaustive, restarts, kicks, seed = args
+    links, wraps = _column_links(scorer, codes, width)
+
+    def fitness(order):
+        return sum(links[a * width + b] for a, b in zip(order, order[1:])) + \
+               wraps[order[-1] * width + order[0]]
+
+    if width <= exhaustive:
+        return max((fitness(order), list(order))
+                   for order in itertools.permutations(range(width)))
+
+    def edges(order, touched):
+        return sum(links[order[p] * width + order[p + 1]] for p in touched) + \
+               wraps[order[-1] * width + order[0]]
+
+    # Either swap the columns at two positions, or slide the one at the first
+    # position along to the second.
+    moves = [(i, j, False) for i, j in itertools.combinations(range(width), 2)]
+    moves += [(i, j, True) for i, j in itertools.permutations(range(width), 2)]
+
+    def climb(order):
+        improved = True
+        while improved:
+            improved = False
+            rng.shuffle(moves)
+            for i, j, slide in moves:
+                # The positions of the links that the move changes.
+                if slide:
+                    touched = range(max(min(i, j) - 1, 0),
+                                    min(max(i, j), width - 2) + 1)
+                else:
+                    touched = set(p for p in (i - 1, i, j - 1, j)
+                                  if 0 <= p < width - 1)
+                before = edges(order, touched)
+                _column_move(order, i, j, slide)
+                if edges(order, touched) - before > _EPSILON:
+                    improved = True
+                else:
+                    _column_move(order, j, i, slide)
+            # Rotating the order only changes which pair of columns wraps
+            # round, but would take many moves.
+            score = fitness(order)
+            for k in range(1, width):
+                if fitness(order[k:] + order[:k]) - score > _EPSILON:
+                    order[:] = order[k:] + order[:k]
+                    score, improved = fitness(order), True
+        return score
+
+    rng = random.Random(seed)
+    best = None
+    for _ in range(restarts):
+        order = list(range(width))
+        rng.shuffle(order)
+        score = climb(order)
+        for _ in range(kicks):
+            kicked = order[:]
+            for _ in range(_KICK):
+                i, j = rng.sample(range(width), 2)
+                _column_move(kicked, i, j, False)
+            kicked_score = climb(kicked)
+            if kicked_score >= score:
+                order, score = kicked, kicked_score
+        if best is None or score > best[0]:
+            best = score, order
+    return best
+
+def _column_move(order, i, j, slide):
+    """
+    Swaps the columns at positions i and j of an order, or slides the one at
+    i along to j.
+    """
+    if slide:
+        order.insert(j, order.pop(i))
+    else:
+        order[i], order[j] = order[j], order[i]
+
+def _column_links(scorer, codes, width):
+    """
+    Returns two flat width x width tables of the bigram fitness contributed
+    by putting one ciphertext column before another: in the same rows, and
+    with the second one row down (as the last and first columns are).
+    """
+    size = len(scorer.alphabet)
+    # Bigrams with a character outside the alphabet score 0.
+    table = [0.0] * (size + 1) ** 2
+    for a in range(size):
+        table[a * (size + 1):a * (size + 1) + size] = \
+            scorer.table[a * size:(a + 1) * size]
+
+    rows = len(codes) // width
+    columns = [codes[i * rows:(i + 1) * rows] for i in range(width)]
+    firsts = [[c * (size + 1) for c in column] for column in columns]
+    links = [sum(map(table.__getitem__, map(operator.add, a, b)))
+             for a in firsts for b in columns]
+    wraps = [sum(map(table.__getitem__, map(operator.add, a[:-1], b[1:])))
+             for a in firsts for b in columns]
+    return links, wraps
+
+def break_railfence(ciphertext, max_rails=None, scorer=None, top=None):
+    """
+    Breaks the rail fence cipher by trying every number of rails up to
+    max_rails (by default, 100, or the length of the ciphertext if that's
+    less; beyond it the cipher does nothing). Each decryption is a fixed
+    permutation of the ciphertext's positions, worked out with integers and
+    kept by number of rails and length, so texts of the same length only pay
+    for it once; the decryptions are then scored a batch at a time with an
+    NgramScorer (by default, with English trigrams) on the lowercased text.
+    Returns the top (by default, all) (fitness, RailFence) tuples.
+    """
+    scorer = _scorer_for(scorer)
+    codes = analysis.encode(ciphertext.lower(), scorer.alphabet)
+    if max_rails is None:
+        max_rails = _RAILS
+    keys = list(range(1, max(min(max_rails, len(codes) - 1), 1) + 1))
+    fitness = array.array('d')
+    for start in range(0, len(keys), _BATCH):
+        # Only a batch of decryptions is ever around at once, so memory
+        # doesn't grow with the number of rails times the length.
+        if len(codes) < 2:
+            candidates = [codes for rails in keys[start:start + _BATCH]]
+        else:
+            candidates = [_rail_fence(rails, len(codes))(codes)
+                          for rails in keys[start:start + _BATCH]]
+        fitness.extend(analysis.score_batch(candidates, scorer=scorer,
+                                            alphabet=scorer.alphabet)[2])
+    return _ranked([(score, cipher.RailFence(rails))
+                    for rails, score in zip(keys, fitness)], True, top)
+
+def _rail_fence(rails, length):
+    """
+    Returns a function that picks the characters of a rail fence ciphertext
+    of the given length out in plaintext order.
+    """
+    key = rails, length
+    if key not in _rail_fences:
+        if len(_rail_fences) >= _RAIL_FENCES:
+            _rail_fences.clear()
+        # Rails are read off in order, each from left to right.
+        cycle = max(2 * (rails - 1), 1)
+        rail = [min(i % cycle, cycle - i % cycle) for i in range(length)]
+        order = sorted(range(length), key=rail.__getitem__)
+        positions = [0] * length
+        for j, i in enumerate(order):
+            positions[i] = j
+        _rail_fences[key] = operator.itemgetter(*positions)
+    return _rail_fences[key]
+
+def _scorer_for(scorer, alphabet=None):
+    """
+    Returns the given scorer, or an English trigram scorer, checking it
+    works on the alphabet if one is given.
+    """
+    global _scorer
+    if scorer is None:
+        if _scorer is None:
+            _scorer = analysis.NgramScorer(english.trigram)
+        scorer = _scorer
+    if alphabet is not None and scorer.alphabet != alphabet:
+        raise ValueError("Scorer's alphabet doesn't match!")
+    return scorer
+
+def _coprime(a, b):
+    return _gcd(a, b) == 1
+
+def _gcd(a, b):
+    while b:
+        a, b = b, a % b
+    return a
+
+def _inverse(perm):
+    inverse = [0] * len(perm)
+    for i, p in enumerate(perm):
+        inverse[p] = i
+    return inverse
+
+def _rotations(counts):
+    """
+    Lists the counts a text's letters would have after shifting it back by
+    each letter of the alphabet.
+    """
+    return [counts[k:] + counts[:k] for k in range(len(counts))]
+
+def _ranked(results, higher, top=None):
+    """
+    Sorts (score, cipher) tuples best first and keeps the top ones.
+    """
+    results.sort(key=operator.itemgetter(0), reverse=higher)
+    return results if top is None else results[:top]
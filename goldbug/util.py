@@ -129,6 +129,15 @@ class Matrix(object):
 
         # Gauss-Jordan.
         for i in range(self.rows):
+            # Run Euclid's algorithm down the column, so that the pivot ends
+            # up as the gcd of its entries: with a composite modulus, none of
+            # them need be invertible by itself.
+            for j in range(i + 1, self.rows):
+                while v[j][i] % modulus:
+                    q = (v[i][i] % modulus) // (v[j][i] % modulus)
+                    v[i] = [(a - q * b) % modulus for a, b in zip(v[i], v[j])]
+                    v[i], v[j] = v[j], v[i]
+
             # Normalise
             try:
                 multiplier = mmi(v[i][i] % modulus, modulus)
@@ -147,7 +156,7 @@ class Matrix(object):
                     v[j][k] = (v[j][k] - multiplier * v[i][k]) % modulus
 
         # Separate out our results.
-        return Matrix([row[len(row) // 3 + 1:] for row in v])
+        return Matrix([row[self.rows:] for row in v])
 
     def __str__(self):
         if isinstance(self.values[0][0], int):
@@ -1,7 +1,11 @@
 #!/usr/bin/env python
 
+import io
+import math
 import os
+import string
 import sys
+import tempfile
 import unittest
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
@@ -26,10 +30,394 @@ class FreqAnalTest(unittest.TestCase):
         self.assertEqual(goldbug.analysis.frequency_analysis("mississipi", 11),
                          {})
 
+    def test_freqanal_alphabet(self):
+        self.assertEqual(goldbug.analysis.frequency_analysis("mis sis", 2,
+                                                             'ims'),
+                         {'mi': 1. / 4, 'is': 2. / 4, 'si': 1. / 4})
+        self.assertEqual(goldbug.analysis.frequency_analysis("Mississipi", 1,
+                                                             'ips'),
+                         {'i': 4. / 9, 's': 4. / 9, 'p': 1. / 9})
+
+    def test_freqanal_long(self):
+        # Long enough to be counted through ngram_counts rather than sliced.
+        text = 'mississipi misses sipping ' * 40
+        for n in range(1, 6):
+            for alphabet in (None, 'imps'):
+                grams = [text[i:i + n] for i in range(len(text) - n + 1)]
+                if alphabet is not None:
+                    grams = [g for g in grams if set(g) <= set(alphabet)]
+                expected = dict((g, grams.count(g) / float(len(grams)))
+                                for g in set(grams))
+                freqs = goldbug.analysis.frequency_analysis(text, n, alphabet)
+                self.assertEqual(sorted(freqs), sorted(expected))
+                for gram in expected:
+                    self.assertAlmostEqual(freqs[gram], expected[gram])
+
+    def test_freqanal_encoded(self):
+        text = 'mississipi misses sipping'
+        codes = goldbug.analysis.encode(text)
+        for n in range(1, 4):
+            self.assertEqual(
+                goldbug.analysis.frequency_analysis(codes, n),
+                goldbug.analysis.frequency_analysis(text, n,
+                                                    string.ascii_lowercase)
+            )
+        self.assertEqual(
+            goldbug.analysis.frequency_analysis(
+                goldbug.analysis.encode(text, 'imps'), 2, 'imps'
+            ),
+            goldbug.analysis.frequency_analysis(text, 2, 'imps')
+        )
+
+class StreamFreqAnalTest(unittest.TestCase):
+    text = u'it was many and many a year ago, in a kingdom by the sea'
+
+    def test_stream_chunks(self):
+        for n in range(1, 6):
+            expected = goldbug.analysis.frequency_analysis(self.text, n)
+            for size in (1, 2, 7, 100):
+                chunks = [self.text[i:i + size]
+                          for i in range(0, len(self.text), size)]
+                self.assertEqual(
+                    goldbug.analysis.stream_frequency_analysis(chunks, n),
+                    expected
+                )
+
+    def test_stream_file(self):
+        expected = goldbug.analysis.frequency_analysis(self.text, 3,
+                                                       'abcdefghijklmnopqrstuvwxyz')
+        self.assertEqual(
+            goldbug.analysis.stream_frequency_analysis(
+                io.StringIO(self.text), 3, 'abcdefghijklmnopqrstuvwxyz', 5
+            ),
+            expected
+        )
+
+        fd, path = tempfile.mkstemp()
+        try:
+            os.write(fd, self.text.encode('ascii'))
+            os.close(fd)
+            self.assertEqual(
+                goldbug.analysis.stream_frequency_analysis(
+                    path, 3, 'abcdefghijklmnopqrstuvwxyz', 4
+                ),
+                expected
+            )
+        finally:
+            os.remove(path)
+
+    def test_stream_short(self):
+        self.assertEqual(goldbug.analysis.stream_frequency_analysis(['a', 'b'],
+                                                                    3),
+                         {})
+        self.assertEqual(goldbug.analysis.stream_frequency_analysis(
+                             ['a', 'b', '', 'c'], 3),
+                         {'abc': 1.0})
+
+class CoincidencesTest(unittest.TestCase):
+    def test_coincidences(self):
+        self.assertEqual(list(goldbug.analysis.coincidences('abcabcab')),
+                         [8, 0, 0, 5, 0])
+        self.assertEqual(list(goldbug.analysis.coincidences('aa a, b.')),
+                         [4, 2, 1])
+        self.assertEqual(list(goldbug.analysis.coincidences('')), [0])
+
+        text = 'itwasmanyandmanyayearagoinakingdombytheseathatamaiden'
+        counts = goldbug.analysis.coincidences(text)
+        self.assertEqual(len(counts), len(text) // 2 + 1)
+        for s, count in enumerate(counts):
+            self.assertEqual(count, sum(a == b for a, b
+                                        in zip(text, text[s:])))
+
+    def test_period(self):
+        plain = ('itwasmanyandmanyayearagoinakingdombytheseathatamaiden'
+                 'therelivedwhomyoumayknowbythenameofannabellee') * 3
+        cipher = goldbug.cipher.Vigenere('lemon').encrypt(plain)
+        counts = goldbug.analysis.coincidences(cipher)
+        best = sorted(range(1, len(counts)), key=counts.__getitem__)[-3:]
+        self.assertTrue(all(s % 5 == 0 for s in best))
+
+class KasiskiTest(unittest.TestCase):
+    def test_repeats(self):
+        self.assertEqual(goldbug.analysis.repeats('abcxabcyabc'),
+                         {'abc': [0, 4, 8]})
+        self.assertEqual(goldbug.analysis.repeats('abcdxabcdyabc'),
+                         {'abc': [0, 5, 10], 'bcd': [1, 6]})
+        self.assertEqual(goldbug.analysis.repeats('abcdxabcdyabc', 4),
+                         {'abcd': [0, 5]})
+        self.assertEqual(goldbug.analysis.repeats('aaaa', 2), {'aa': [0, 1, 2]})
+        self.assertEqual(goldbug.analysis.repeats('abcdef'), {})
+        self.assertEqual(goldbug.analysis.repeats(''), {})
+
+    def test_kasiski(self):
+        self.assertEqual(goldbug.analysis.kasiski('abcxyzabcxyzabc'),
+                         {2: 7, 3: 7, 6: 7})
+        plain = ('itwasmanyandmanyayearagoinakingdombytheseathatamaiden'
+                 'therelivedwhomyoumayknowbythenameofannabellee') * 3
+        cipher = goldbug.cipher.Vigenere('lemon').encrypt(plain)
+        factors = goldbug.analysis.kasiski(cipher, 4)
+        self.assertEqual(max(factors, key=factors.get), 5)
+
+class RollingTest(unittest.TestCase):
+    text = 'it was many and many a year ago, in a kingdom by the sea'
+    clean = text.replace(' ', '').replace(',', '')
+
+    def test_rolling_ngram_counts(self):
+        windows = list(c[:] for c in
+                       goldbug.analysis.rolling_ngram_counts(self.text, 10, 2))
+        self.assertEqual(len(windows), len(self.clean) - 9)
+        for i, counts in enumerate(windows):
+            self.assertEqual(counts,
+                             goldbug.analysis.ngram_counts(
+                                 self.clean[i:i + 10], 2, dense=True
+                             ))
+        self.assertEqual(list(goldbug.analysis.rolling_ngram_counts('abc', 4)),
+                         [])
+        self.assertRaises(ValueError, list,
+                          goldbug.analysis.rolling_ngram_counts('abc', 1, 2))
+
+    def test_rolling_ic(self):
+        ics = goldbug.analysis.rolling_ic(self.text, 12)
+        self.assertEqual(len(ics), len(self.clean) - 11)
+        for i, ic in enumerate(ics):
+            self.assertAlmostEqual(ic, goldbug.analysis.ic(self.clean[i:i + 12]))
+
+        bigrams = list(goldbug.freq.english.bigram)
+        ics = goldbug.analysis.rolling_ic(self.text, 12, bigrams)
+        for i, ic in enumerate(ics):
+            self.assertAlmostEqual(ic, goldbug.analysis.ic(self.clean[i:i + 12],
+                                                           bigrams))
+
+    def test_rolling_chi2(self):
+        for freqs in (goldbug.freq.english.unigram,
+                      goldbug.freq.english.bigram):
+            scores = goldbug.analysis.rolling_chi2(self.text, 15, freqs)
+            self.assertEqual(len(scores), len(self.clean) - 14)
+            for i, score in enumerate(scores):
+                self.assertAlmostEqual(score,
+                                       goldbug.analysis.chi2(
+                                           self.clean[i:i + 15], freqs
+                                       ))
+
+        self.assertEqual(list(goldbug.analysis.rolling_chi2('aabab', 2,
+                                                            {'a': 1,
+                                                             'b': 0})),
+                         [0.0, float('inf'), float('inf'), float('inf')])
+
+class NgramScorerTest(unittest.TestCase):
+    def test_score(self):
+        scorer = goldbug.analysis.NgramScorer({'ab': .5, 'ba': .25, 'bb': .25},
+                                              'ab', floor=.01)
+        self.assertEqual(scorer.ngram, 2)
+        self.assertAlmostEqual(scorer.score('abba'),
+                               math.log(.5) + math.log(.25) * 2)
+        self.assertAlmostEqual(scorer.score('aab b'),
+                               math.log(.01) + math.log(.5))
+        self.assertEqual(scorer.score('a'), 0)
+        self.assertEqual(scorer.score(goldbug.analysis.encode('abba', 'ab')),
+                         scorer.score('abba'))
+
+    def test_english(self):
+        scorer = goldbug.analysis.NgramScorer(goldbug.freq.english.trigram)
+        plain = 'itwasmanyandmanyayearagoinakingdombytheseathatamaiden'
+        cipher = goldbug.cipher.Caesar(3).encrypt(plain)
+        self.assertTrue(scorer.score(plain) > scorer.score(cipher))
+
+    def test_bad(self):
+        self.assertRaises(ValueError, goldbug.analysis.NgramScorer,
+                          {'a': .5, 'bb': .5})
+        self.assertRaises(ValueError, goldbug.analysis.NgramScorer,
+                          {'a': .5, 'B': .5})
+
+class ScoreBatchTest(unittest.TestCase):
+    candidates = ['itwasmanyandmanyayearago', 'lwzdvpdqbdqgpdqbdbhdudjr',
+                  'it was many', 'a']
+
+    def test_score_batch(self):
+        scorer = goldbug.analysis.NgramScorer(goldbug.freq.english.trigram)
+        freqs = goldbug.freq.english.bigram
+        chi2s, ics, fitness = goldbug.analysis.score_batch(self.candidates,
+                                                           freqs, scorer)
+        self.assertEqual(len(chi2s), 4)
+        for i, candidate in enumerate(self.candidates):
+            self.assertAlmostEqual(chi2s[i],
+                                   goldbug.analysis.chi2(candidate, freqs))
+            self.assertAlmostEqual(fitness[i], scorer.score(candidate))
+        for i, candidate in enumerate(self.candidates[:3]):
+            self.assertAlmostEqual(ics[i], goldbug.analysis.ic(candidate))
+        self.assertTrue(math.isnan(ics[3]))
+        self.assertTrue(fitness[0] > fitness[1])
+
+    def test_encoded(self):
+        rows = [goldbug.analysis.encode(c) for c in self.candidates]
+        self.assertEqual(goldbug.analysis.score_batch(rows,
+                                                      goldbug.freq.english
+                                                             .unigram)[0],
+                         goldbug.analysis.score_batch(self.candidates,
+                                                      goldbug.freq.english
+                                                             .unigram)[0])
+        chi2s, ics, fitness = goldbug.analysis.score_batch([list(rows[0])])
+        self.assertEqual((chi2s, fitness), (None, None))
+        self.assertAlmostEqual(ics[0],
+                               goldbug.analysis.ic(self.candidates[0]))
+
+class SubstitutionScorerTest(unittest.TestCase):
+    plain = ('it was many and many a year ago, in a kingdom by the sea, that a '
+             'maiden there lived whom you may know by the name of annabel lee')
+
+    def test_swaps(self):
+        scorer = goldbug.analysis.NgramScorer(goldbug.freq.english.trigram)
+        key = 'qwertyuiopasdfghjklzxcvbnm'
+        cipher = goldbug.cipher.Simple(dict(zip(string.ascii_lowercase, key)))
+        ciphertext = cipher.encrypt(self.plain)
+        decrypt = dict(zip(key, string.ascii_lowercase))
+
+        subst = goldbug.analysis.SubstitutionScorer(scorer, ciphertext, decrypt)
+        self.assertEqual(subst.key, decrypt)
+        self.assertAlmostEqual(subst.fitness, scorer.score(self.plain))
+
+        for a, b in ('et', 'ae', 'zq', 'nn', 'yb'):
+            delta = subst.delta(a, b)
+            subst.swap(a, b, delta)
+            plain = goldbug.cipher.Simple(dict((v, k) for k, v
+                                               in subst.key.items())) \
+                           .decrypt(ciphertext)
+            self.assertAlmostEqual(subst.fitness, scorer.score(plain))
+        subst.swap('e', 't')
+        self.assertEqual(subst.key['t'], 'e')
+
+        self.assertAlmostEqual(subst.score(decrypt), scorer.score(self.plain))
+        self.assertAlmostEqual(subst.score(key), scorer.score(
+            goldbug.cipher.Simple(dict(zip(key, string.ascii_lowercase)))
+                  .decrypt(ciphertext)))
+        self.assertRaises(ValueError, subst.score, 'abc')
+
+    def test_assign(self):
+        scorer = goldbug.analysis.NgramScorer(goldbug.freq.english.trigram)
+        symbols = {'a': '12', 'e': '345', 'n': '67', 't': '89'}
+        symbols.update((c, c) for c in 'bcdfghijklmopqrsuvwxyz')
+        cipher = goldbug.cipher.Homophonic(goldbug.util.RandomDict(symbols))
+        ciphertext = cipher.encrypt(self.plain)
+        alphabet = 'bcdfghijklmopqrsuvwxyz123456789'
+        decrypt = dict((s, c) for c, s in cipher.key.items())
+
+        subst = goldbug.analysis.SubstitutionScorer(scorer, ciphertext,
+                                                    decrypt, alphabet)
+        self.assertAlmostEqual(subst.fitness, scorer.score(self.plain))
+        self.assertEqual(subst.assign_delta('3', 'e'), 0.0)
+        for c, p in (('3', 'a'), ('8', 'e'), ('b', 'b'), ('3', 'x')):
+            delta = subst.assign_delta(c, p)
+            subst.assign(c, p, delta)
+            self.assertEqual(subst.key[c], p)
+            found = goldbug.util.RandomDict(
+                dict((l, [s for s in alphabet if subst.key[s] == l])
+                     for l in set(subst.key.values())))
+            plain = goldbug.cipher.Homophonic(found).decrypt(ciphertext)
+            self.assertAlmostEqual(subst.fitness, scorer.score(plain))
+
+        # Swaps still move every character decrypting to each letter.
+        subst.swap('e', 'q')
+        self.assertEqual(sorted(c for c in alphabet if subst.key[c] == 'q'),
+                         ['4', '5', '8'])
+        subst.assign('8', 't')
+        self.assertAlmostEqual(subst.fitness, subst.score(subst.key))
+
+    def test_identity(self):
+        scorer = goldbug.analysis.NgramScorer(goldbug.freq.english.bigram)
+        subst = goldbug.analysis.SubstitutionScorer(scorer, self.plain)
+        self.assertAlmostEqual(subst.fitness, scorer.score(self.plain))
+        self.assertTrue(subst.delta('e', 'q') < 0)
+        self.assertRaises(ValueError, goldbug.analysis.SubstitutionScorer,
+                          scorer, self.plain, {'a': 'b'})
+
+class EncodeTest(unittest.TestCase):
+    def test_encode(self):
+        self.assertEqual(list(goldbug.analysis.encode('hello, world')),
+                         [7, 4, 11, 11, 14, 26, 26, 22, 14, 17, 11, 3])
+        self.assertEqual(list(goldbug.analysis.encode('abcd', 'dcb')),
+                         [3, 2, 1, 0])
+        self.assertRaises(ValueError, goldbug.analysis.encode, 'a', 'aa')
+        self.assertEqual(list(goldbug.analysis.encode('hello, world',
+                                                      strip=True)),
+                         [7, 4, 11, 11, 14, 22, 14, 17, 11, 3])
+
+class NgramCountsTest(unittest.TestCase):
+    def test_ngram_counts(self):
+        self.assertEqual(goldbug.analysis.ngram_counts('mississipi'),
+                         {'m': 1, 'i': 4, 's': 4, 'p': 1})
+        self.assertEqual(goldbug.analysis.ngram_counts('aaa aa', 2),
+                         {'aa': 3})
+        self.assertEqual(goldbug.analysis.ngram_counts('abcabcab', 3, 'abc'),
+                         {'abc': 2, 'bca': 2, 'cab': 2})
+        self.assertEqual(goldbug.analysis.ngram_counts('ab', 3), {})
+        self.assertRaises(ValueError, goldbug.analysis.ngram_counts, 'ab', 0)
+
+    def test_ngram_counts_dense(self):
+        self.assertEqual(goldbug.analysis.ngram_counts('abba', 2, 'ab',
+                                                       dense=True),
+                         [0, 1, 1, 1])
+        counts = goldbug.analysis.ngram_counts('the quick brown fox', 2,
+                                               dense=True)
+        self.assertEqual(len(counts), 26 ** 2)
+        self.assertEqual(sum(counts), 12)
+        self.assertEqual(counts[19 * 26 + 7], 1) # 'th'
+
+    def test_ngram_counts_encoded(self):
+        codes = goldbug.analysis.encode('mississipi')
+        self.assertEqual(goldbug.analysis.ngram_counts(codes, 2),
+                         goldbug.analysis.ngram_counts('mississipi', 2))
+
 class Chi2Test(unittest.TestCase):
     def test_chi2(self):
         self.assertEqual(goldbug.analysis.chi2('aaa', {'a': 1}), 0.0)
         self.assertEqual(goldbug.analysis.chi2('aaa', {'a': 0}), float('inf'))
+        self.assertEqual(goldbug.analysis.chi2('aaa', {'aa': 1}), 0.0)
+        self.assertAlmostEqual(goldbug.analysis.chi2('aab', {'a': .5,
+                                                           'b': .5}),
+                               1. / 3)
+        self.assertAlmostEqual(goldbug.analysis.chi2('abab', {'ab': .5,
+                                                            'ba': .25,
+                                                            'bb': .25}),
+                               1.0)
+
+    def test_chi2_encoded(self):
+        freqs = {'a': .25, 'b': .5, 'c': .25}
+        for text in ['abcab', 'aaxb', 'cc']:
+            self.assertAlmostEqual(
+                goldbug.analysis.chi2(text, freqs),
+                goldbug.analysis.chi2(goldbug.analysis.encode(text, 'abc'),
+                                      freqs)
+            )
+
+    def test_chi2_scorer(self):
+        freqs = {'a': .25, 'b': .75}
+        scorer = goldbug.analysis.Chi2Scorer(freqs)
+        for text in ('aab', 'abb', ''):
+            self.assertAlmostEqual(scorer.score(text),
+                                   goldbug.analysis.chi2(text, freqs))
+        self.assertAlmostEqual(scorer.score('aab'), 25. / 9)
+
+        # Counts are in alphabet order; the total includes other characters.
+        self.assertAlmostEqual(scorer.score_counts([2, 1]), 25. / 9)
+        self.assertAlmostEqual(scorer.score_counts([2, 1], 4),
+                               goldbug.analysis.chi2('aa b', freqs))
+        scorer = goldbug.analysis.Chi2Scorer(freqs, 'ba')
+        self.assertAlmostEqual(scorer.score_counts([1, 2]), 25. / 9)
+        self.assertRaises(ValueError,
+                          goldbug.analysis.Chi2Scorer({'a': 1, 'ab': 1})
+                                         .score_counts, [1, 1])
+
+        # Each call prepares the table afresh, so changing it counts.
+        freqs['a'], freqs['b'] = .5, .5
+        self.assertAlmostEqual(goldbug.analysis.chi2('aab', freqs), 1. / 3)
+
+    def test_chi2_batch(self):
+        texts = ['aab', 'abb', 'aaa']
+        freqs = {'a': .5, 'b': .5}
+        scores = goldbug.analysis.chi2_batch(texts, freqs)
+        self.assertEqual(len(scores), 3)
+        for text, score in zip(texts, scores):
+            self.assertAlmostEqual(score, goldbug.analysis.chi2(text, freqs))
 
 class ICTest(unittest.TestCase):
     def test_ic(self):
@@ -44,5 +432,52 @@ class ICTest(unittest.TestCase):
                                                     'ca', 'cb', 'cc']),
                                0.9473684)
 
+        bigrams = dict((a + b, 0) for a in 'abc' for b in 'abc')
+        self.assertAlmostEqual(goldbug.analysis.ic('bcbcabaaababbabcbccc',
+                                                   bigrams.keys()),
+                               0.9473684)
+        self.assertAlmostEqual(goldbug.analysis.ic('bc bc-ab!aaababbabcbccc',
+                                                   bigrams.keys()),
+                               0.9473684)
+
+    def test_periodic_ic(self):
+        plain = ('itwasmanyandmanyayearagoinakingdombytheseathatamaiden'
+                 'therelivedwhomyoumayknowbythenameofannabellee')
+        cipher = goldbug.cipher.Vigenere('poe').encrypt(plain)
+        ics = goldbug.analysis.periodic_ic(cipher, 10)
+        self.assertEqual(sorted(ics), list(range(1, 11)))
+        for period in ics:
+            if period % 3:
+                self.assertTrue(ics[3] > ics[period])
+        for period in (1, 3, 7):
+            columns = [cipher[i::period] for i in range(period)]
+            self.assertAlmostEqual(ics[period],
+                                   sum(goldbug.analysis.ic(column)
+                                       for column in columns) / period)
+
+        codes = goldbug.analysis.encode(cipher)
+        self.assertEqual(goldbug.analysis.periodic_ic(codes, 6, min_period=3),
+                         dict((p, ics[p]) for p in range(3, 7)))
+
+        self.assertEqual(goldbug.analysis.periodic_ic('AB cd', 3),
+                         {1: 0.0})
+
+    def test_fractionated_periods(self):
+        plain = ('itwasmanyandmanyayearagoinakingdombytheseathatamaiden'
+                 'therelivedwhomyoumayknowbythenameofannabellee'
+                 'andthismaidenshelivedwithnootherthoughtthantolove'
+                 'andbelovedbyme')
+        alphabet = 'abcdefghiklmnopqrstuvwxyz'
+        for period in (0, 4, 7, 10):
+            cipher = goldbug.cipher.Bifid('phqgmeaylnofdxkrcvszwbuti', period)
+            scores = goldbug.analysis.fractionated_periods(
+                cipher.encrypt(plain), 12, alphabet=alphabet)
+            self.assertEqual(sorted(scores), [0] + list(range(2, 13)))
+            self.assertEqual(max(scores, key=scores.get), period)
+
+        # Too short to have any tuples.
+        self.assertEqual(goldbug.analysis.fractionated_periods('ab', 3, 3),
+                         {})
+
 if __name__ == '__main__':
     unittest.main()
@@ -299,6 +299,13 @@ class HomophonicTest(unittest.TestCase):
         self.assertEqual(cipher.decrypt('23'), 'ab')
         self.assertEqual(cipher.decrypt('24'), 'ab')
 
+    def test_homophonic_cases(self):
+        # Y is a character in its own right; Z is just an uppercase z.
+        d = goldbug.util.RandomDict({'a': 'xY', 'b': 'yz'})
+        cipher = goldbug.cipher.Homophonic(d)
+        self.assertEqual(cipher.decrypt('xYyz'), 'aabb')
+        self.assertEqual(cipher.decrypt('Y Z'), 'a B')
+
     @unittest.skipIf(sys.version_info[0] > 2, 'No string in Python 3')
     def test_unicode(self):
         cipher = goldbug.cipher.Homophonic(goldbug.util.RandomDict({'a': '12',
@@ -818,6 +825,8 @@ class BifidTest(unittest.TestCase):
         cipher = goldbug.cipher.Bifid('phqgmeaylnofdxkrcvszwbuti', 5)
         self.assertEqual(cipher.decrypt('ffyhmkhycpliashadtrlhcchlblr'),
                          'defendtheeastwallofthecastle')
+        self.assertEqual(cipher.decrypt(cipher.encrypt('fleeatonce')),
+                         'fleeatonce')
 
     def test_bifid_bad(self):
         cipher = goldbug.cipher.Bifid('bgwkzqpndsioaxefclumthyvr')
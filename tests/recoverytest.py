@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+
+# Checks that the annealing and hill-climbing solvers recover keys. Not
+# every restart finds one, so each gets enough restarts that it's unlikely
+# none of them do, whatever random numbers this version of Python draws.
+# They're slow, so they're left out of make tests: run make recovery.
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import goldbug
+from solverstest import LONGER, PLAINTEXT
+
+class BifidTest(unittest.TestCase):
+    def test_break_bifid(self):
+        # About a quarter of restarts find the key.
+        plaintext = ''.join(c for c in PLAINTEXT.lower() if c.isalpha())
+        plaintext = plaintext.replace('j', 'i')
+        bifid = goldbug.cipher.Bifid('phqgmeaylnofdxkrcvszwbuti', 6)
+        ciphertext = bifid.encrypt(plaintext)
+        results = goldbug.solvers.break_bifid(ciphertext, 6, iterations=10000,
+                                              restarts=16)
+        self.assertEqual(results[0][1].period, 6)
+        self.assertEqual(results[0][1].decrypt(ciphertext), plaintext)
+
+    def test_break_trifid(self):
+        # It takes a longer text than Bifid; about a quarter of restarts
+        # find the key.
+        plaintext = ''.join(c for c in LONGER.lower() if c.isalpha())[:600]
+        trifid = goldbug.cipher.Trifid('epsducvwym.zlkxnbtfgorijhaq', 7)
+        ciphertext = trifid.encrypt(plaintext)
+        results = goldbug.solvers.break_trifid(ciphertext, 7, iterations=8000,
+                                               restarts=16)
+        self.assertEqual(results[0][1].decrypt(ciphertext), plaintext)
+
+class FourSquareTest(unittest.TestCase):
+    def test_break_foursquare(self):
+        # Not every restart finds the keys; this one does.
+        plaintext = ''.join(c for c in PLAINTEXT.lower() if c.isalpha())
+        plaintext = plaintext.replace('j', 'i')
+        foursquare = goldbug.cipher.FourSquare(
+            (goldbug.util.Polybius('example'), goldbug.util.Polybius('keyword')))
+        ciphertext = foursquare.encrypt(plaintext)
+        results = goldbug.solvers.break_foursquare(ciphertext, 50000,
+                                                   restarts=1, processes=1,
+                                                   seed=5)
+        self.assertEqual(results[0][1].decrypt(ciphertext), plaintext)
+        self.assertEqual(results[0][1].keys[0].contents,
+                         'examplbcdfghiknoqrstuvwyz')
+
+class FractionatedMorseTest(unittest.TestCase):
+    def test_break_fractionatedmorse(self):
+        # Not every restart finds the key; this one does.
+        morse = goldbug.cipher.FractionatedMorse('goldbug')
+        ciphertext = morse.encrypt(PLAINTEXT)
+        results = goldbug.solvers.break_fractionatedmorse(
+            ciphertext, restarts=1, processes=1, seed=0)
+        self.assertEqual(results[0][1].key, 'goldbuacefhijkmnpqrstvwxyz')
+        self.assertEqual(results[0][1].decrypt(ciphertext),
+                         morse.decrypt(ciphertext))
+
+class PlayfairTest(unittest.TestCase):
+    def test_break_playfair(self):
+        # Not every restart finds the key; this one does.
+        playfair = goldbug.cipher.Playfair('thequickbrownfox')
+        ciphertext = playfair.encrypt(PLAINTEXT)
+        results = goldbug.solvers.break_playfair(ciphertext, 40000, restarts=1,
+                                                 processes=1, seed=3)
+        self.assertEqual(results[0][1].key, 'adglmpsvyzthequickbrownfx')
+        self.assertEqual(results[0][1].decrypt(ciphertext),
+                         playfair.decrypt(ciphertext))
+
+class RagbabyTest(unittest.TestCase):
+    def test_break_ragbaby(self):
+        # Not every restart finds the key; this one does.
+        ciphertext = goldbug.cipher.Ragbaby('goldbug').encrypt(PLAINTEXT)
+        results = goldbug.solvers.break_ragbaby(ciphertext, 20000, restarts=1,
+                                                processes=1, seed=1)
+        self.assertEqual(results[0][1].key, 'acefhijkmnpqrstvwxyzgoldbu')
+        self.assertEqual(results[0][1].decrypt(ciphertext), PLAINTEXT)
+
+class TwoSquareTest(unittest.TestCase):
+    def test_break_twosquare(self):
+        # It takes a good deal of text, and this restart finds the keys (up
+        # to the order of their lines). Horizontal squares are harder still.
+        plaintext = ''.join(c for c in LONGER.lower() if c.isalpha())
+        plaintext = plaintext.replace('j', 'i')[:1116]
+        twosquare = goldbug.cipher.TwoSquare(
+            (goldbug.util.Polybius('example'), goldbug.util.Polybius('keyword')))
+        ciphertext = twosquare.encrypt(plaintext)
+        results = goldbug.solvers.break_twosquare(ciphertext, False, 50000,
+                                                  restarts=1, processes=1,
+                                                  seed=2)
+        self.assertEqual(results[0][1].decrypt(ciphertext), plaintext)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,629 @@
+#!/usr/bin/env python
+
+import itertools
+import os
+import string
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import goldbug
+
+# The opening of The Gold-Bug.
+PLAINTEXT = ('Many years ago, I contracted an intimacy with a Mr. William '
+             'Legrand. He was of an ancient Huguenot family, and had once '
+             'been wealthy; but a series of misfortunes had reduced him to '
+             'want. To avoid the mortification consequent upon his disasters, '
+             'he left New Orleans, the city of his forefathers, and took up '
+             'his residence at Sullivan\'s Island, near Charleston, South '
+             'Carolina.')
+
+# And on, for the solvers that need more text.
+LONGER = PLAINTEXT + (' This Island is a very singular one. It consists of '
+                      'little else than the sea sand, and is about three '
+                      'miles long. Its breadth at no point exceeds a quarter '
+                      'of a mile. It is separated from the main land by a '
+                      'scarcely perceptible creek, oozing its way through a '
+                      'wilderness of reeds and slime, a favorite resort of '
+                      'the marsh-hen. The vegetation, as might be supposed, '
+                      'is scant, or at least dwarfish. No trees of any '
+                      'magnitude are to be seen. Near the western '
+                      'extremity, where Fort Moultrie stands, and where are '
+                      'some miserable frame buildings, tenanted, during '
+                      'summer, by the fugitives from Charleston dust and '
+                      'fever, may be found, indeed, the bristly palmetto; '
+                      'but the whole island, with the exception of this '
+                      'western point, and a line of hard, white beach on '
+                      'the seacoast, is covered with a dense undergrowth of '
+                      'the sweet myrtle, so much prized by the '
+                      'horticulturists of England. The shrub here often '
+                      'attains the height of fifteen or twenty feet, and '
+                      'forms an almost impenetrable coppice, burthening the '
+                      'air with its fragrance.')
+
+class AffineTest(unittest.TestCase):
+    def test_break_affine(self):
+        for key in ((5, 8), (25, 3), (1, 0)):
+            ciphertext = goldbug.cipher.Affine(key).encrypt(PLAINTEXT)
+            results = goldbug.solvers.break_affine(ciphertext)
+            self.assertEqual(len(results), 10)
+            self.assertEqual(results[0][1].key, key)
+            self.assertEqual(results[0][1].decrypt(ciphertext), PLAINTEXT)
+
+        results = goldbug.solvers.break_affine(ciphertext, top=None)
+        self.assertEqual(len(results), 12 * 26)
+
+    def test_break_affine_alphabet(self):
+        alphabet = string.ascii_lowercase + '.'
+        ciphertext = goldbug.cipher.Affine((7, 11), alphabet) \
+                            .encrypt(PLAINTEXT.lower())
+        results = goldbug.solvers.break_affine(ciphertext, alphabet, top=None)
+        self.assertEqual(len(results), 18 * 27)
+        self.assertEqual(results[0][1].key, (7, 11))
+
+    def test_break_affine_scorer(self):
+        scorer = goldbug.analysis.NgramScorer(goldbug.freq.english.trigram)
+        ciphertext = goldbug.cipher.Affine((9, 4)).encrypt(PLAINTEXT[:60])
+        results = goldbug.solvers.break_affine(ciphertext, scorer=scorer)
+        self.assertEqual(results[0][1].key, (9, 4))
+        for score, affine in results:
+            plaintext = affine.decrypt(ciphertext).lower()
+            self.assertAlmostEqual(score, scorer.score(plaintext))
+        self.assertEqual([s for s, _ in results],
+                         sorted((s for s, _ in results), reverse=True))
+
+        self.assertRaises(ValueError, goldbug.solvers.break_affine,
+                          ciphertext, 'abc', scorer=scorer)
+
+class AutokeyTest(unittest.TestCase):
+    def test_break_autokey(self):
+        plaintext = ''.join(c for c in PLAINTEXT.lower() if c.isalpha())
+        for key in ('k', 'queen', 'supercalifragilistic'):
+            ciphertext = goldbug.cipher.Autokey(key).encrypt(plaintext)
+            results = goldbug.solvers.break_autokey(ciphertext)
+            self.assertEqual(results[0][1].key, key)
+            self.assertEqual(results[0][1].decrypt(ciphertext), plaintext)
+            self.assertEqual([s for s, _ in results],
+                             sorted((s for s, _ in results), reverse=True))
+
+        results = goldbug.solvers.break_autokey(ciphertext, max_primer=10)
+        self.assertTrue(all(len(a.key) <= 10 for _, a in results))
+
+        results = goldbug.solvers.break_autokey(ciphertext.upper())
+        self.assertEqual(results[0][1].key, key)
+
+    def test_break_autokey_chi2(self):
+        # A scorer that rates every text the same leaves the primers as chi2
+        # found them.
+        flat = goldbug.analysis.NgramScorer(dict((c, 1) for c in
+                                                 string.ascii_lowercase))
+        plaintext = ''.join(c for c in PLAINTEXT.lower() if c.isalpha())
+        ciphertext = goldbug.cipher.Autokey('kingdom').encrypt(plaintext)
+        results = goldbug.solvers.break_autokey(ciphertext, scorer=flat)
+        self.assertTrue('kingdom' in [a.key for _, a in results])
+
+        for key in ('crypto', 'zebras'):
+            ciphertext = goldbug.cipher.Autokey(key).encrypt(plaintext[:80])
+            results = goldbug.solvers.break_autokey(ciphertext)
+            self.assertEqual(results[0][1].key, key)
+
+    def test_break_autokey_short(self):
+        self.assertEqual(goldbug.solvers.break_autokey(''), [])
+        ciphertext = goldbug.cipher.Autokey('key').encrypt('attackatdawn')
+        results = goldbug.solvers.break_autokey(ciphertext)
+        self.assertTrue(all(len(a.key) <= 2 for _, a in results))
+
+class BazeriesTest(unittest.TestCase):
+    def test_break_bazeries(self):
+        plaintext = ''.join(c for c in PLAINTEXT.lower() if c.isalpha())
+        plaintext = plaintext.replace('j', 'i')
+        ciphertext = goldbug.cipher.Bazeries(3752).encrypt(plaintext)
+        scorer = goldbug.analysis.NgramScorer(goldbug.freq.english.trigram)
+        results = goldbug.solvers.break_bazeries(ciphertext.upper(), 5000,
+                                                 top=5, processes=1)
+        self.assertEqual(len(results), 5)
+        self.assertEqual(results[0][1].key, 3752)
+        self.assertEqual(results[0][1].decrypt(ciphertext), plaintext)
+        self.assertEqual([s for s, _ in results],
+                         sorted((s for s, _ in results), reverse=True))
+        for fitness, result in results:
+            self.assertTrue(isinstance(result, goldbug.cipher.Bazeries))
+            self.assertAlmostEqual(fitness,
+                                   scorer.score(result.decrypt(ciphertext)))
+
+        results = goldbug.solvers.break_bazeries(ciphertext, 3760, 3740,
+                                                 top=30, processes=1)
+        self.assertEqual(sorted(r.key for _, r in results),
+                         list(range(3740, 3761)))
+        self.assertEqual(len(goldbug.solvers.break_bazeries('', 10)), 10)
+        self.assertRaises(ValueError, goldbug.solvers.break_bazeries,
+                          ciphertext, min_key=0)
+        self.assertRaises(ValueError, goldbug.solvers.break_bazeries,
+                          ciphertext, alphabet='abcdefghiklmnopqrstuvwxy.')
+
+class BifidTest(unittest.TestCase):
+    def test_break_bifid(self):
+        plaintext = ''.join(c for c in PLAINTEXT.lower() if c.isalpha())
+        plaintext = plaintext.replace('j', 'i')
+        bifid = goldbug.cipher.Bifid('phqgmeaylnofdxkrcvszwbuti', 6)
+        ciphertext = bifid.encrypt(plaintext)
+        scorer = goldbug.analysis.NgramScorer(goldbug.freq.english.trigram)
+        results = goldbug.solvers.break_bifid(ciphertext, iterations=500,
+                                              restarts=2, scorer=scorer,
+                                              processes=1)
+        self.assertTrue(1 <= len(results) <= 6)
+        self.assertTrue(6 in [r.period for _, r in results])
+        self.assertEqual([s for s, _ in results],
+                         sorted((s for s, _ in results), reverse=True))
+        for fitness, result in results:
+            self.assertTrue(isinstance(result, goldbug.cipher.Bifid))
+            self.assertAlmostEqual(fitness,
+                                   scorer.score(result.decrypt(ciphertext)))
+
+        results = goldbug.solvers.break_bifid(ciphertext.upper(), 0,
+                                              iterations=10, restarts=1)
+        self.assertEqual([r.period for _, r in results], [0])
+        self.assertEqual(goldbug.solvers.break_bifid('', iterations=10), [])
+        self.assertRaises(ValueError, goldbug.solvers.break_bifid, 'abc',
+                          alphabet='abc')
+
+    def test_break_trifid(self):
+        plaintext = ''.join(c for c in PLAINTEXT.lower() if c.isalpha())
+        trifid = goldbug.cipher.Trifid('epsducvwym.zlkxnbtfgorijhaq', 7)
+        ciphertext = trifid.encrypt(plaintext)
+        scorer = goldbug.analysis.NgramScorer(goldbug.freq.english.trigram)
+        results = goldbug.solvers.break_trifid(ciphertext, 7, iterations=500,
+                                               restarts=2, scorer=scorer,
+                                               processes=1)
+        self.assertEqual(len(results), 2)
+        for fitness, result in results:
+            self.assertTrue(isinstance(result, goldbug.cipher.Trifid))
+            self.assertEqual(result.period, 7)
+            # Each full stop counts as three unseen trigrams.
+            decrypted = result.decrypt(ciphertext)
+            self.assertAlmostEqual(fitness, scorer.score(decrypted) +
+                                   3 * scorer.floor * decrypted.count('.'))
+
+class CaesarTest(unittest.TestCase):
+    def test_break_caesar(self):
+        for key in (0, 3, 25):
+            ciphertext = goldbug.cipher.Caesar(key).encrypt(PLAINTEXT)
+            results = goldbug.solvers.break_caesar(ciphertext)
+            self.assertEqual(len(results), 26)
+            self.assertEqual(results[0][1].key, key)
+            self.assertEqual(results[0][1].decrypt(ciphertext), PLAINTEXT)
+            self.assertEqual([s for s, _ in results],
+                             sorted(s for s, _ in results))
+
+        ciphertext = goldbug.cipher.Rot13().encrypt(PLAINTEXT)
+        results = goldbug.solvers.break_caesar(ciphertext, top=3)
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[0][1].key, 13)
+
+    def test_break_caesar_scores(self):
+        ciphertext = goldbug.cipher.Caesar(7).encrypt(PLAINTEXT).lower()
+        unigram = goldbug.freq.english.unigram
+        for score, caesar in goldbug.solvers.break_caesar(ciphertext):
+            chi2 = goldbug.analysis.chi2(caesar.decrypt(ciphertext), unigram)
+            self.assertAlmostEqual(score, chi2, places=6)
+
+        self.assertEqual(goldbug.solvers.break_caesar('', top=1)[0][0], 0.0)
+
+class ColumnTest(unittest.TestCase):
+    def test_break_column(self):
+        ciphertext = goldbug.cipher.Column('german').encrypt(PLAINTEXT)
+        results = goldbug.solvers.break_column(ciphertext, 8, processes=1)
+        self.assertEqual(results[0][1].key, 'cbfdae')
+        self.assertEqual(results[0][1].decrypt(ciphertext), PLAINTEXT)
+        self.assertEqual(sorted(len(c.key) for _, c in results),
+                         [w for w in range(2, 9) if len(ciphertext) % w == 0])
+        self.assertEqual([s for s, _ in results],
+                         sorted((s for s, _ in results), reverse=True))
+
+        scorer = goldbug.analysis.NgramScorer(goldbug.freq.english.bigram)
+        plaintext = ''.join(c for c in PLAINTEXT.lower() if c.isalpha())
+        ciphertext = goldbug.cipher.Column('wheatonfly').encrypt(plaintext)
+        results = goldbug.solvers.break_column(ciphertext, 10, exhaustive=4,
+                                               restarts=2, kicks=10,
+                                               scorer=scorer, processes=1)
+        self.assertEqual(results[0][1].decrypt(ciphertext), plaintext)
+        for fitness, column in results:
+            self.assertAlmostEqual(fitness, scorer.score(
+                column.decrypt(ciphertext).ljust(len(ciphertext), 'x')))
+
+    def test_break_column_invalid(self):
+        break_column = goldbug.solvers.break_column
+        self.assertEqual(break_column('abcdefghijklmnopqrstuvw'), [])
+        self.assertRaises(ValueError, break_column, 'abcdef', 27)
+        trigram = goldbug.analysis.NgramScorer(goldbug.freq.english.trigram)
+        self.assertRaises(ValueError, break_column, 'abcdef', scorer=trigram)
+
+class FourSquareTest(unittest.TestCase):
+    def test_break_foursquare(self):
+        plaintext = ''.join(c for c in PLAINTEXT.lower() if c.isalpha())
+        plaintext = plaintext.replace('j', 'i')
+        foursquare = goldbug.cipher.FourSquare(
+            (goldbug.util.Polybius('example'), goldbug.util.Polybius('keyword')))
+        ciphertext = foursquare.encrypt(plaintext)
+        scorer = goldbug.analysis.NgramScorer(goldbug.freq.english.trigram)
+        results = goldbug.solvers.break_foursquare(ciphertext, 2000,
+                                                   restarts=2, scorer=scorer,
+                                                   processes=1)
+        self.assertEqual(len(results), 2)
+        self.assertEqual([s for s, _ in results],
+                         sorted((s for s, _ in results), reverse=True))
+        for fitness, result in results:
+            self.assertTrue(isinstance(result, goldbug.cipher.FourSquare))
+            self.assertEqual(result.alphabet.contents,
+                             'abcdefghiklmnopqrstuvwxyz')
+            self.assertAlmostEqual(fitness,
+                                   scorer.score(result.decrypt(ciphertext)))
+
+    def test_break_foursquare_invalid(self):
+        break_foursquare = goldbug.solvers.break_foursquare
+        self.assertRaises(ValueError, break_foursquare, 'abc')
+        self.assertRaises(ValueError, break_foursquare, 'abcd', alphabet='abcd')
+        bigram = goldbug.analysis.NgramScorer(goldbug.freq.english.bigram)
+        self.assertRaises(ValueError, break_foursquare, 'abcd', scorer=bigram)
+
+class HomophonicTest(unittest.TestCase):
+    plaintext = ''.join(c for c in LONGER.lower() if c.isalpha())
+
+    def encrypt(self, pool):
+        # Up to seven characters for a letter, each used in turn.
+        spread = dict(e=7, t=5, a=4, o=4, i=4, n=4, s=3, h=3, r=3, c=2, d=2,
+                      l=2, u=2)
+        pool = iter(pool)
+        symbols = dict((c, [next(pool) for _ in range(spread.get(c, 1))])
+                       for c in string.ascii_lowercase)
+        cycles = dict((c, itertools.cycle(s)) for c, s in symbols.items())
+        ciphertext = ''.join(next(cycles[c]) for c in self.plaintext)
+        self.assertEqual(len(set(ciphertext)), 57)
+        return ciphertext
+
+    def test_break_homophonic(self):
+        ciphertext = self.encrypt(string.ascii_lowercase + string.digits +
+                                  string.punctuation)
+        scorer = goldbug.analysis.NgramScorer(goldbug.freq.english.trigram)
+        results = goldbug.solvers.break_homophonic(ciphertext, iterations=2000,
+                                                   restarts=2, scorer=scorer,
+                                                   processes=1)
+        self.assertTrue(1 <= len(results) <= 2)
+        self.assertEqual([s for s, _ in results],
+                         sorted((s for s, _ in results), reverse=True))
+        for fitness, result in results:
+            self.assertTrue(isinstance(result, goldbug.cipher.Homophonic))
+            self.assertEqual(sorted(result.decrypt_mapping),
+                             sorted(set(ciphertext)))
+            self.assertAlmostEqual(fitness,
+                                   scorer.score(result.decrypt(ciphertext)))
+
+        # The whitespace isn't part of the alphabet unless you say so.
+        results = goldbug.solvers.break_homophonic('ab cd', iterations=100,
+                                                   restarts=1)
+        self.assertEqual(sorted(results[0][1].decrypt_mapping), list('abcd'))
+        results = goldbug.solvers.break_homophonic('ab cd', 'ab ', 100,
+                                                   restarts=1)
+        self.assertEqual(sorted(results[0][1].decrypt_mapping), list(' ab'))
+
+    def test_break_homophonic_cases(self):
+        # A and a stand for different letters.
+        ciphertext = self.encrypt(string.ascii_uppercase + string.digits +
+                                  string.ascii_lowercase)
+        self.assertTrue('A' in ciphertext and 'a' in ciphertext)
+        scorer = goldbug.analysis.NgramScorer(goldbug.freq.english.trigram)
+        results = goldbug.solvers.break_homophonic(ciphertext, iterations=2000,
+                                                   restarts=1, scorer=scorer,
+                                                   processes=1)
+        fitness, result = results[0]
+        self.assertEqual(sorted(result.decrypt_mapping),
+                         sorted(set(ciphertext)))
+        self.assertAlmostEqual(fitness,
+                               scorer.score(result.decrypt(ciphertext)))
+
+class FractionatedMorseTest(unittest.TestCase):
+    def errors(self, key, ciphertext):
+        # Codes that aren't Morse, and runs of spaces, in the decryption.
+        trigraphs = [''.join(t) for t in itertools.product('.-X', repeat=3)]
+        stream = ''.join(trigraphs[key.index(c)] for c in ciphertext)
+        codes = set(goldbug.cipher.FractionatedMorse.morse.values())
+        return stream.count('XXX') + sum(code not in codes
+                                         for code in stream.split('X'))
+
+    def test_break_fractionatedmorse(self):
+        morse = goldbug.cipher.FractionatedMorse('goldbug')
+        ciphertext = morse.encrypt(PLAINTEXT)[:40]
+        scorer = goldbug.analysis.NgramScorer(goldbug.freq.english.trigram)
+        results = goldbug.solvers.break_fractionatedmorse(
+            ciphertext.upper(), restarts=3, kicks=2, scorer=scorer,
+            processes=1)
+        self.assertTrue(1 <= len(results) <= 3)
+        # Fewest invalid codes first, then best first.
+        ranks = [(self.errors(result.key, ciphertext), -fitness)
+                 for fitness, result in results]
+        self.assertEqual(ranks, sorted(ranks))
+        for fitness, result in results:
+            self.assertTrue(isinstance(result,
+                                       goldbug.cipher.FractionatedMorse))
+            if self.errors(result.key, ciphertext):
+                continue
+            # Words are run together, and anything else costs three unseen
+            # trigrams.
+            plaintext = result.decrypt(ciphertext)
+            self.assertNotEqual(plaintext.strip(), '')
+            self.assertFalse('  ' in plaintext.strip())
+            others = sum(not c.isalpha() and c != ' ' for c in plaintext)
+            self.assertAlmostEqual(fitness, scorer.score(''.join(
+                c for c in plaintext if c.isalpha())) +
+                                   3 * scorer.floor * others)
+
+        # The best attempt is returned even if it doesn't decrypt to valid
+        # Morse.
+        results = goldbug.solvers.break_fractionatedmorse(
+            ciphertext, restarts=1, kicks=0, scorer=scorer, processes=1)
+        self.assertEqual(len(results), 1)
+
+        results = goldbug.solvers.break_fractionatedmorse('', restarts=1)
+        self.assertEqual(results[0][0], 0)
+
+class HillTest(unittest.TestCase):
+    def test_break_hill(self):
+        plaintext = ''.join(c for c in PLAINTEXT.lower() if c.isalpha())
+        for key in ('ddcf', 'gybnqkurp'):
+            hill = goldbug.cipher.Hill(key)
+            ciphertext = hill.encrypt(plaintext)
+            results = goldbug.solvers.break_hill(ciphertext, hill.key.rows)
+            self.assertEqual(results[0][1].key, hill.key)
+            self.assertEqual(results[0][1].decrypt(ciphertext), plaintext)
+            self.assertEqual([s for s, _ in results],
+                             sorted((s for s, _ in results), reverse=True))
+
+        results = goldbug.solvers.break_hill(ciphertext.upper(),
+                                             hill.key.rows)
+        self.assertEqual(results[0][1].key, hill.key)
+
+        self.assertEqual(goldbug.solvers.break_hill('', 3), [])
+
+    def test_solve_hill(self):
+        plaintext = 'shortexamplesforhillkeys'
+        key = goldbug.util.Matrix(((8, 8, 7, 5), (2, 3, 1, 6),
+                                   (3, 7, 4, 2), (5, 6, 9, 5)))
+        for hill in (goldbug.cipher.Hill('ddcf'), goldbug.cipher.Hill(key)):
+            ciphertext = hill.encrypt(plaintext)
+            solved = goldbug.solvers.solve_hill(plaintext, ciphertext,
+                                                hill.key.rows)
+            self.assertEqual(solved.key, hill.key)
+
+        # No two of these blocks make an invertible matrix modulo 26, but
+        # ca and ac do modulo 13, and na and an modulo 2.
+        hill = goldbug.cipher.Hill('ddcf')
+        solved = goldbug.solvers.solve_hill('caacnaan',
+                                            hill.encrypt('caacnaan'))
+        self.assertEqual(solved.key, hill.key)
+
+        solved = goldbug.solvers.solve_hill('CAACNAAN',
+                                            hill.encrypt('caacnaan').upper())
+        self.assertEqual(solved.key, hill.key)
+
+        solve_hill = goldbug.solvers.solve_hill
+        self.assertRaises(ValueError, solve_hill, 'help', 'hia')
+        self.assertRaises(ValueError, solve_hill, 'help', 'hiat', 3)
+        self.assertRaises(ValueError, solve_hill, 'hehehehe', 'hihihihi')
+        self.assertRaises(ValueError, solve_hill, 'helpmeet', 'hiatzzzz')
+        # Each block is only looked at once, so this doesn't take forever.
+        plaintext = 'abcd' * 500
+        self.assertRaises(ValueError, solve_hill, plaintext,
+                          goldbug.cipher.Hill(key).encrypt(plaintext), 4)
+
+class PlayfairTest(unittest.TestCase):
+    def test_break_playfair(self):
+        playfair = goldbug.cipher.Playfair('thequickbrownfox')
+        ciphertext = playfair.encrypt(PLAINTEXT)
+        scorer = goldbug.analysis.NgramScorer(goldbug.freq.english.trigram)
+        results = goldbug.solvers.break_playfair(ciphertext, 3000, restarts=3,
+                                                 scorer=scorer, processes=1)
+        self.assertTrue(1 <= len(results) <= 3)
+        self.assertEqual([s for s, _ in results],
+                         sorted((s for s, _ in results), reverse=True))
+        for fitness, result in results:
+            self.assertEqual(result.key[0], 'a')
+            self.assertEqual(len(set(result.key)), 25)
+            self.assertAlmostEqual(fitness,
+                                   scorer.score(result.decrypt(ciphertext)))
+
+        # Shifting the square's rows and columns round doesn't change it.
+        square = playfair.polybius.contents
+        shifted = ''.join(square[(i // 5 + 3) % 5 * 5 + (i + 2) % 5]
+                          for i in range(25))
+        self.assertEqual(goldbug.cipher.Playfair(shifted).decrypt(ciphertext),
+                         playfair.decrypt(ciphertext))
+
+    def test_break_playfair_schedule(self):
+        calls = []
+        def schedule(i, iterations, temperature):
+            calls.append((i, iterations, temperature))
+            return 0.0
+        ciphertext = goldbug.cipher.Playfair('playfair').encrypt(PLAINTEXT)
+        goldbug.solvers.break_playfair(ciphertext, 50, 7.0, restarts=1,
+                                       processes=1, schedule=schedule)
+        self.assertEqual(calls, [(i, 50, 7.0) for i in range(50)])
+        self.assertEqual(goldbug.solvers.linear_schedule(0, 50, 7.0), 7.0)
+        self.assertEqual(goldbug.solvers.linear_schedule(25, 50, 7.0), 3.5)
+
+    def test_break_playfair_invalid(self):
+        break_playfair = goldbug.solvers.break_playfair
+        self.assertRaises(ValueError, break_playfair, 'abc')
+        self.assertRaises(ValueError, break_playfair, 'aabc')
+        bigram = goldbug.analysis.NgramScorer(goldbug.freq.english.bigram)
+        self.assertRaises(ValueError, break_playfair, 'abcd', scorer=bigram)
+
+class RagbabyTest(unittest.TestCase):
+    def test_break_ragbaby(self):
+        ragbaby = goldbug.cipher.Ragbaby('goldbug')
+        ciphertext = ragbaby.encrypt(PLAINTEXT)
+        scorer = goldbug.analysis.NgramScorer(goldbug.freq.english.trigram)
+        results = goldbug.solvers.break_ragbaby(ciphertext, 500, restarts=3,
+                                                scorer=scorer, processes=1)
+        self.assertTrue(1 <= len(results) <= 3)
+        self.assertEqual([s for s, _ in results],
+                         sorted((s for s, _ in results), reverse=True))
+        for fitness, result in results:
+            self.assertTrue(isinstance(result, goldbug.cipher.Ragbaby))
+            self.assertEqual(result.key[0], 'a')
+            self.assertEqual(len(set(result.key)), 26)
+            # Words are run together for scoring.
+            plaintext = result.decrypt(ciphertext).lower()
+            self.assertAlmostEqual(fitness, scorer.score(''.join(
+                c for c in plaintext if c.isalpha())))
+
+        # Rotating the keyed alphabet doesn't change the cipher.
+        self.assertEqual(goldbug.cipher.Ragbaby('acefhijkmnpqrstvwxyzgoldbu')
+                         .decrypt(ciphertext), PLAINTEXT)
+        self.assertEqual(goldbug.solvers.break_ragbaby('', 10)[0][0], 0)
+        self.assertRaises(ValueError, goldbug.solvers.break_ragbaby, 'abc',
+                          alphabet='abc.')
+
+class RailFenceTest(unittest.TestCase):
+    def test_break_railfence(self):
+        for key in (2, 3, 7, 40):
+            ciphertext = goldbug.cipher.RailFence(key).encrypt(PLAINTEXT)
+            results = goldbug.solvers.break_railfence(ciphertext)
+            self.assertEqual(len(results), 100)
+            self.assertEqual(results[0][1].key, key)
+            self.assertEqual(results[0][1].decrypt(ciphertext), PLAINTEXT)
+
+        scorer = goldbug.analysis.NgramScorer(goldbug.freq.english.trigram)
+        results = goldbug.solvers.break_railfence(ciphertext, 50, top=5)
+        self.assertEqual(len(results), 5)
+        for fitness, railfence in results:
+            plaintext = railfence.decrypt(ciphertext).lower()
+            self.assertAlmostEqual(fitness, scorer.score(plaintext))
+        self.assertEqual([s for s, _ in results],
+                         sorted((s for s, _ in results), reverse=True))
+
+    def test_break_railfence_short(self):
+        for ciphertext in ('', 'a', 'ab'):
+            results = goldbug.solvers.break_railfence(ciphertext)
+            self.assertEqual([r.key for _, r in results], [1])
+        ciphertext = goldbug.cipher.RailFence(5).encrypt(PLAINTEXT[:40])
+        results = goldbug.solvers.break_railfence(ciphertext)
+        self.assertEqual(len(results), 39)
+        self.assertEqual(results[0][1].key, 5)
+
+class SubstitutionTest(unittest.TestCase):
+    def test_break_substitution(self):
+        key = dict(zip(string.ascii_lowercase, 'qwertyuiopasdfghjklzxcvbnm'))
+        for cipher in (goldbug.cipher.Simple(key),
+                       goldbug.cipher.Keyword('goldbug'),
+                       goldbug.cipher.KamaSutra('vqajflymsbckuhzdxtenorpwig')):
+            ciphertext = cipher.encrypt(PLAINTEXT)
+            results = goldbug.solvers.break_substitution(ciphertext, 2, 5,
+                                                         processes=1)
+            self.assertEqual(results[0][1].decrypt(ciphertext), PLAINTEXT)
+            self.assertTrue(isinstance(results[0][1], goldbug.cipher.Simple))
+            self.assertEqual([s for s, _ in results],
+                             sorted((s for s, _ in results), reverse=True))
+
+    def test_break_substitution_symbols(self):
+        plaintext = ('agoodglassinthebishopshostelinthedevilsseatfortyone'
+                     'degreesandthirteenminutesnortheastandbynorthmain'
+                     'branchseventhlimbeastsideshootfromthelefteyeofthe'
+                     'deathsheadabeelinefromthetreethroughtheshotfifty'
+                     'feetout')
+        key = dict(zip('abcdefghilmnoprstuvy', '52-81346093*#.();?%:'))
+        ciphertext = goldbug.cipher.Simple(key).encrypt(plaintext)
+        alphabet = ''.join(sorted(set(ciphertext)))
+        results = goldbug.solvers.break_substitution(ciphertext, 3,
+                                                     alphabet=alphabet,
+                                                     processes=1)
+        # The text is short enough for a few rare letters to be mixed up
+        # without hurting the fitness, but the search itself should be sound.
+        scorer = goldbug.analysis.NgramScorer(goldbug.freq.english.trigram)
+        self.assertTrue(results[0][0] >= scorer.score(plaintext) - 1e-6)
+        self.assertEqual(results[0][1].decrypt(ciphertext)[:20],
+                         plaintext[:20])
+
+        self.assertRaises(ValueError, goldbug.solvers.break_substitution,
+                          ciphertext, alphabet=string.printable)
+
+    def test_break_substitution_processes(self):
+        ciphertext = goldbug.cipher.Keyword('goldbug').encrypt(PLAINTEXT[:80])
+        one = goldbug.solvers.break_substitution(ciphertext, 3, 1, processes=1)
+        two = goldbug.solvers.break_substitution(ciphertext, 3, 1, processes=2)
+        self.assertEqual([(s, c.key) for s, c in one],
+                         [(s, c.key) for s, c in two])
+
+class TwoSquareTest(unittest.TestCase):
+    def test_break_twosquare(self):
+        plaintext = ''.join(c for c in PLAINTEXT.lower() if c.isalpha())
+        plaintext = plaintext.replace('j', 'i')
+        keys = (goldbug.util.Polybius('example'),
+                goldbug.util.Polybius('keyword'))
+        scorer = goldbug.analysis.NgramScorer(goldbug.freq.english.trigram)
+        for horizontal in (False, True):
+            twosquare = goldbug.cipher.TwoSquare(keys, horizontal)
+            ciphertext = twosquare.encrypt(plaintext)
+            results = goldbug.solvers.break_twosquare(ciphertext, horizontal,
+                                                      2000, restarts=2,
+                                                      scorer=scorer,
+                                                      processes=1)
+            self.assertEqual(len(results), 2)
+            for fitness, result in results:
+                self.assertEqual(result.horizontal, horizontal)
+                self.assertAlmostEqual(fitness,
+                                       scorer.score(result.decrypt(ciphertext)))
+
+                # Keys come back with their lines in order.
+                rows = [[k.contents[i * 5:i * 5 + 5] for i in range(5)]
+                        for k in result.keys]
+                columns = [[k.contents[i::5] for i in range(5)]
+                           for k in result.keys]
+                own, shared = (columns, rows) if horizontal else (rows, columns)
+                self.assertEqual(shared[0], sorted(shared[0], key=min))
+                for lines in own:
+                    self.assertEqual(lines, sorted(lines, key=min))
+
+class VigenereTest(unittest.TestCase):
+    ciphertext = ('soybzygxgljpciubeubwzkrlqjhzoalfzqozvlpsqorztdnfkm'
+                  'flqebkcodrgutgbnlfhznirxfhuztlpjfegbokbxutqpefytcs'
+                  'loubehiedtyxosdrggoytzuuotkgsdelkjinheboshzzbhzzcl'
+                  'ypcjzvppplzottfbnoubnromkwipquovubsltxoyodwflynswh'
+                  'gntkkzumygtgekfwozmziicylcchguznscvbhjzcznvjnogcht'
+                  'cjkbnhbnyazwlwutywdobhjtsludbgxzpvuitycfwiwgxcwlou')
+
+    def test_break_vigenere(self):
+        results = goldbug.solvers.break_vigenere(self.ciphertext)
+        self.assertEqual(results[0][1].key, 'goldbug')
+        self.assertEqual([s for s, _ in results],
+                         sorted((s for s, _ in results), reverse=True))
+        self.assertEqual(len(set(v.key for _, v in results)), len(results))
+        self.assertTrue(results[0][1].decrypt(self.ciphertext)
+                        .startswith('manyyearsago'))
+
+    def test_break_vigenere_keys(self):
+        plaintext = ''.join(c for c in PLAINTEXT.lower() if c.isalpha())
+        for key in ('a', 'lemon', 'cryptographic'):
+            ciphertext = goldbug.cipher.Vigenere(key).encrypt(plaintext)
+            results = goldbug.solvers.break_vigenere(ciphertext)
+            self.assertEqual(results[0][1].key, key)
+
+        # Other characters are ignored.
+        ciphertext = goldbug.cipher.Vigenere('lemon').encrypt(plaintext)
+        spaced = ' '.join(ciphertext[i:i + 5]
+                          for i in range(0, len(ciphertext), 5))
+        results = goldbug.solvers.break_vigenere(spaced.upper() + spaced)
+        self.assertEqual(results[0][1].key, 'lemon')
+        results = goldbug.solvers.break_vigenere(spaced.upper())
+        self.assertEqual(results[0][1].key, 'lemon')
+
+    def test_break_vigenere_short(self):
+        self.assertEqual(goldbug.solvers.break_vigenere(''), [])
+        results = goldbug.solvers.break_vigenere('abcdefghijkl')
+        self.assertTrue(all(len(v.key) <= 2 for _, v in results))
+        scorer = goldbug.analysis.NgramScorer(goldbug.freq.english.trigram)
+        self.assertRaises(ValueError, goldbug.solvers.break_vigenere,
+                          self.ciphertext, alphabet='abc', scorer=scorer)
+
+if __name__ == '__main__':
+    unittest.main()
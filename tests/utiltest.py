@@ -87,6 +87,15 @@ class MatrixTest(unittest.TestCase):
         m = pow(goldbug.util.Matrix(((1, 2), (3, 4))), -1, 7)
         self.assertEqual(m.values, [[5, 1], [5, 3]])
 
+        # No entry of the first column is invertible by itself.
+        m = pow(goldbug.util.Matrix(((2, 1), (13, 1))), -1, 26)
+        self.assertEqual(m.values, [[7, 19], [13, 14]])
+
+        m = pow(goldbug.util.Matrix(((8, 8, 7, 5), (2, 3, 1, 6),
+                                     (3, 7, 4, 2), (5, 6, 9, 5))), -1, 26)
+        self.assertEqual(m.values, [[1, 6, 22, 9], [7, 22, 15, 23],
+                                    [21, 5, 9, 11], [10, 21, 1, 1]])
+
         m = goldbug.util.Matrix(((1, 2), (3, 4)))
         self.assertRaises(NotImplementedError, pow, m, -1)
         self.assertRaises(ValueError, pow, m, -1, 2)